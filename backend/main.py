@@ -2,20 +2,40 @@
 
 Exposes API endpoints for Instagram login/logout, fetching post comments,
 and selecting random giveaway winners. Also serves the frontend as static files.
+
+All endpoints are ``async def`` and run on the event loop. Logout,
+validate-session and pick-winners only touch in-process state and never
+block. Blocking Instagram I/O is always moved off the loop: login runs
+the cookie check in a worker thread, and fetch-comments hands instaloader
+one page at a time to a worker thread (see ``backend.scraper``).
+
+Run the app as a single Uvicorn worker (``uvicorn backend.main:app``):
+sessions and cached scrape results live in process memory and are not
+shared between workers. The work is I/O-bound, so one event loop with a
+small pool of worker threads is enough.
 """
 
 import asyncio
+import functools
+import hashlib
 import logging
 from collections.abc import AsyncIterator
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import asynccontextmanager, suppress
 from pathlib import Path
+from typing import Any
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import Response
 from fastapi.staticfiles import StaticFiles
+from pydantic import BaseModel
 
 from backend.models import (
+    BatchFetchCommentsItem,
+    BatchFetchCommentsRequest,
+    BatchFetchCommentsResponse,
     FetchCommentsRequest,
     FetchCommentsResponse,
     LoginRequest,
@@ -25,6 +45,7 @@ from backend.models import (
     ValidateSessionRequest,
     ValidateSessionResponse,
 )
+from backend.rate_limiter import RateLimitExceededError, rate_limiter
 from backend.scraper import (
     InvalidURLError,
     PostNotFoundError,
@@ -44,9 +65,39 @@ logger = logging.getLogger(__name__)
 
 _FRONTEND_DIR = Path(__file__).resolve().parent.parent / "frontend"
 
+# The frontend files keep stable names (no content hash), so browsers may
+# cache them but must revalidate via ETag before reuse. Unchanged files
+# then cost a bodyless 304 instead of a full download.
+_FRONTEND_CACHE_CONTROL = "no-cache"
+
 # Interval between expired-session cleanup sweeps.
 _CLEANUP_INTERVAL_SECONDS = 300  # 5 minutes
 
+# Size of the worker-thread pool used by asyncio.to_thread for blocking
+# Instagram calls. Far below Python's default (min(32, cpus + 4)) on purpose:
+# more parallel Instagram requests only lead to HTTP 429 responses.
+_WORKER_THREADS = 8
+
+# Requests each client may make per minute. The scraping endpoints share one
+# budget, charged per post, since every post fetched costs Instagram requests.
+_LOGIN_RATE_LIMIT = 10
+_VALIDATE_SESSION_RATE_LIMIT = 100
+_SCRAPE_RATE_LIMIT = 10
+
+# Maximum number of posts of a batch request that are scraped at the same time.
+# Keeps a single batch from bursting past Instagram's rate limits.
+_BATCH_FETCH_CONCURRENCY = 8
+
+# HTTP status returned for each scraper failure. Subclasses must precede
+# ScraperError, which is the catch-all for unexpected upstream failures.
+_SCRAPER_ERROR_STATUS_CODES: tuple[tuple[type[ScraperError], int], ...] = (
+    (InvalidURLError, 400),
+    (PostNotFoundError, 404),
+    (PrivatePostError, 403),
+    (RateLimitError, 429),
+    (ScraperError, 502),
+)
+
 
 async def _periodic_session_cleanup() -> None:
     """Run session_store.cleanup_expired() every _CLEANUP_INTERVAL_SECONDS.
@@ -59,13 +110,48 @@ async def _periodic_session_cleanup() -> None:
         session_store.cleanup_expired()
 
 
+def _enforce_rate_limit(http_request: Request, bucket: str, limit: int, cost: int = 1) -> None:
+    """Count a request against the calling client's budget for ``bucket``.
+
+    Raises:
+        HTTPException 429: If the client has exceeded ``limit`` this minute.
+    """
+    client = http_request.client.host if http_request.client else "unknown"
+    try:
+        rate_limiter.hit(bucket, client, limit, cost)
+    except RateLimitExceededError as exc:
+        raise HTTPException(status_code=429, detail=str(exc)) from exc
+
+
+def _json_response(model: BaseModel) -> Response:
+    """Serialise a response model built by our own code straight to JSON.
+
+    Returning the model itself would make FastAPI dump it to Python objects,
+    validate those again against the route's ``response_model`` and only then
+    encode them. Scrape results can hold tens of thousands of users, so they
+    are serialised once, by pydantic-core, instead. The route's
+    ``response_model`` still documents the schema.
+    """
+    return Response(content=model.model_dump_json(), media_type="application/json")
+
+
+def _scraper_error_status_code(exc: ScraperError) -> int:
+    """Return the HTTP status code that corresponds to a scraper failure."""
+    return next(status for exc_type, status in _SCRAPER_ERROR_STATUS_CODES if isinstance(exc, exc_type))
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> AsyncIterator[None]:
     """Manage application-wide startup and shutdown resources.
 
-    Starts a background task that periodically purges expired sessions.
-    The task is cancelled automatically when the application shuts down.
+    Caps the worker-thread pool used for blocking Instagram calls and starts
+    a background task that periodically purges expired sessions. The task is
+    cancelled and the worker threads are shut down when the application
+    shuts down.
     """
+    executor = ThreadPoolExecutor(max_workers=_WORKER_THREADS, thread_name_prefix="givegram-worker")
+    asyncio.get_running_loop().set_default_executor(executor)
+
     cleanup_task = asyncio.create_task(_periodic_session_cleanup())
     logger.info("Started periodic session cleanup task (interval=%ds)", _CLEANUP_INTERVAL_SECONDS)
     try:
@@ -75,6 +161,7 @@ async def lifespan(app: FastAPI) -> AsyncIterator[None]:
         with suppress(asyncio.CancelledError):
             await cleanup_task
         logger.info("Stopped periodic session cleanup task")
+        executor.shutdown(wait=False, cancel_futures=True)
 
 
 app = FastAPI(
@@ -84,6 +171,10 @@ app = FastAPI(
     lifespan=lifespan,
 )
 
+# Comment lists are repetitive JSON and compress very well, which matters
+# for mobile clients. Small responses are not worth the CPU.
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -99,7 +190,7 @@ app.add_middleware(
 
 
 @app.post("/api/login", response_model=LoginResponse)  # type: ignore[untyped-decorator]
-async def api_login(request: LoginRequest) -> LoginResponse:
+async def api_login(request: LoginRequest, http_request: Request) -> LoginResponse:
     """Authenticate with Instagram using a session cookie and create a session.
 
     The returned session_id must be included in subsequent requests
@@ -107,13 +198,19 @@ async def api_login(request: LoginRequest) -> LoginResponse:
 
     Raises:
         HTTPException 401: If the session cookie is invalid or expired.
+        HTTPException 429: If the client has made too many login attempts, or
+            the server's Instagram query budget is used up.
     """
     logger.info("Login attempt via session cookie")
+    _enforce_rate_limit(http_request, "login", _LOGIN_RATE_LIMIT)
 
+    # Validating the cookie calls Instagram, so keep it off the event loop.
     try:
         session_id, username = await asyncio.to_thread(session_store.login_with_cookie, request.session_cookie)
     except LoginFailedError as exc:
         raise HTTPException(status_code=401, detail=str(exc)) from exc
+    except RateLimitError as exc:
+        raise HTTPException(status_code=429, detail=str(exc)) from exc
 
     return LoginResponse(session_id=session_id, username=username)
 
@@ -134,7 +231,7 @@ async def api_logout(session_id: str) -> dict[str, str]:
 
 
 @app.post("/api/validate-session", response_model=ValidateSessionResponse)  # type: ignore[untyped-decorator]
-async def api_validate_session(request: ValidateSessionRequest) -> ValidateSessionResponse:
+async def api_validate_session(request: ValidateSessionRequest, http_request: Request) -> ValidateSessionResponse:
     """Check whether a backend session is still alive without hitting Instagram.
 
     The frontend calls this on page load with a previously stored session_id
@@ -143,8 +240,10 @@ async def api_validate_session(request: ValidateSessionRequest) -> ValidateSessi
 
     Raises:
         HTTPException 401: If the session does not exist or has expired.
+        HTTPException 429: If the client has made too many validation requests.
     """
     logger.info("Session validation request for session %s", request.session_id)
+    _enforce_rate_limit(http_request, "validate-session", _VALIDATE_SESSION_RATE_LIMIT)
 
     try:
         username = session_store.validate(request.session_id)
@@ -160,7 +259,7 @@ async def api_validate_session(request: ValidateSessionRequest) -> ValidateSessi
 
 
 @app.post("/api/fetch-comments", response_model=FetchCommentsResponse)  # type: ignore[untyped-decorator]
-async def api_fetch_comments(request: FetchCommentsRequest) -> FetchCommentsResponse:
+async def api_fetch_comments(request: FetchCommentsRequest, http_request: Request) -> Response:
     """Scrape comments from an Instagram post using an authenticated session.
 
     Accepts an Instagram post URL and a session_id, fetches all comments,
@@ -171,7 +270,8 @@ async def api_fetch_comments(request: FetchCommentsRequest) -> FetchCommentsResp
         HTTPException 400: If the URL is invalid.
         HTTPException 404: If the post cannot be found.
         HTTPException 403: If the post is private.
-        HTTPException 429: If Instagram rate-limits the request.
+        HTTPException 429: If Instagram rate-limits the request, or the client
+            has made too many scraping requests.
         HTTPException 502: For any other upstream scraping failure.
     """
     url_str = str(request.url)
@@ -182,19 +282,64 @@ async def api_fetch_comments(request: FetchCommentsRequest) -> FetchCommentsResp
     except SessionNotFoundError as exc:
         raise HTTPException(status_code=401, detail=str(exc)) from exc
 
+    # Charged only once the session is known to be valid, since only then
+    # does the request cost Instagram queries.
+    _enforce_rate_limit(http_request, "scrape", _SCRAPE_RATE_LIMIT)
+
     try:
-        return await asyncio.to_thread(fetch_comments, url_str, loader)
-    except InvalidURLError as exc:
-        raise HTTPException(status_code=400, detail=str(exc)) from exc
-    except PostNotFoundError as exc:
-        raise HTTPException(status_code=404, detail=str(exc)) from exc
-    except PrivatePostError as exc:
-        raise HTTPException(status_code=403, detail=str(exc)) from exc
-    except RateLimitError as exc:
-        raise HTTPException(status_code=429, detail=str(exc)) from exc
+        response = await fetch_comments(url_str, loader)
     except ScraperError as exc:
-        logger.exception("Unexpected scraper error for URL: %s", url_str)
-        raise HTTPException(status_code=502, detail=str(exc)) from exc
+        status_code = _scraper_error_status_code(exc)
+        if status_code == 502:
+            logger.exception("Unexpected scraper error for URL: %s", url_str)
+        raise HTTPException(status_code=status_code, detail=str(exc)) from exc
+    return _json_response(response)
+
+
+@app.post("/api/fetch-comments/batch", response_model=BatchFetchCommentsResponse)  # type: ignore[untyped-decorator]
+async def api_fetch_comments_batch(
+    request: BatchFetchCommentsRequest,
+    http_request: Request,
+) -> Response:
+    """Scrape comments from several Instagram posts concurrently.
+
+    Posts are scraped concurrently, with at most
+    ``_BATCH_FETCH_CONCURRENCY`` posts in flight at once. A failing post
+    does not fail the batch: its outcome carries the HTTP status and error
+    message the single-post endpoint would have returned.
+
+    Raises:
+        HTTPException 401: If the session is missing or expired.
+        HTTPException 429: If the client has made too many scraping requests;
+            every post in the batch counts as one request.
+    """
+    url_strs = [str(url) for url in request.urls]
+    logger.info("Received batch fetch-comments request for %d URL(s) (session=%s)", len(url_strs), request.session_id)
+
+    try:
+        loader = session_store.get_client(request.session_id)
+    except SessionNotFoundError as exc:
+        raise HTTPException(status_code=401, detail=str(exc)) from exc
+
+    # Charged only once the session is known to be valid, since only then
+    # does the request cost Instagram queries.
+    _enforce_rate_limit(http_request, "scrape", _SCRAPE_RATE_LIMIT, cost=len(url_strs))
+
+    semaphore = asyncio.Semaphore(_BATCH_FETCH_CONCURRENCY)
+
+    async def fetch_one(url_str: str) -> BatchFetchCommentsItem:
+        async with semaphore:
+            try:
+                result = await fetch_comments(url_str, loader)
+            except ScraperError as exc:
+                status_code = _scraper_error_status_code(exc)
+                if status_code == 502:
+                    logger.exception("Unexpected scraper error for URL: %s", url_str)
+                return BatchFetchCommentsItem(url=url_str, status_code=status_code, error=str(exc))
+        return BatchFetchCommentsItem(url=url_str, status_code=200, result=result)
+
+    results = await asyncio.gather(*(fetch_one(url_str) for url_str in url_strs))
+    return _json_response(BatchFetchCommentsResponse(results=list(results)))
 
 
 # ---------------------------------------------------------------------------
@@ -238,12 +383,61 @@ async def api_pick_winners(request: PickWinnersRequest) -> PickWinnersResponse:
 # ---------------------------------------------------------------------------
 
 
+@functools.cache
+def _load_index_page() -> tuple[bytes, str]:
+    """Read ``index.html`` once per process and compute its ETag.
+
+    The ETag is weak: GZipMiddleware may re-encode the body, so the bytes
+    sent are not always identical to the file.
+
+    Returns:
+        A ``(content, etag)`` tuple. Changes to the file on disk are picked
+        up on the next restart.
+    """
+    content = (_FRONTEND_DIR / "index.html").read_bytes()
+    return content, f'W/"{hashlib.sha1(content, usedforsecurity=False).hexdigest()}"'
+
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Return whether an ``If-None-Match`` header matches ``etag``.
+
+    The header may list several entity tags separated by commas, or ``*``.
+    Tags are compared weakly, i.e. ignoring any ``W/`` prefix, as RFC 9110
+    requires for ``If-None-Match``.
+    """
+    if if_none_match is None:
+        return False
+    opaque_tag = etag.removeprefix("W/")
+    return any(
+        tag == "*" or tag.removeprefix("W/") == opaque_tag
+        for tag in (part.strip() for part in if_none_match.split(","))
+    )
+
+
 @app.get("/")  # type: ignore[untyped-decorator]
-async def serve_index() -> FileResponse:
-    """Serve the frontend single-page application entry point."""
-    return FileResponse(_FRONTEND_DIR / "index.html")
+async def serve_index(request: Request) -> Response:
+    """Serve the frontend single-page application entry point.
+
+    Returns 304 Not Modified when the browser already holds the current
+    version (its ``If-None-Match`` header matches our ETag).
+    """
+    content, etag = _load_index_page()
+    headers = {"ETag": etag, "Cache-Control": _FRONTEND_CACHE_CONTROL}
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=content, media_type="text/html", headers=headers)
+
+
+class _FrontendStaticFiles(StaticFiles):
+    """StaticFiles that makes browsers revalidate assets before reusing them."""
+
+    def file_response(self, *args: Any, **kwargs: Any) -> Response:
+        """Add the frontend Cache-Control header to every served file."""
+        response = super().file_response(*args, **kwargs)
+        response.headers["Cache-Control"] = _FRONTEND_CACHE_CONTROL
+        return response
 
 
 # Mount static assets (CSS, JS) after API routes so that
 # /api/* paths are matched first and never shadowed.
-app.mount("/", StaticFiles(directory=_FRONTEND_DIR), name="frontend")
+app.mount("/", _FrontendStaticFiles(directory=_FRONTEND_DIR), name="frontend")
@@ -79,6 +79,47 @@ class FetchCommentsResponse(BaseModel):
 
     users: list[CommentUserData] = Field(description="List of unique commenters with their comment counts")
     total_comments: int = Field(ge=0, description="Total number of comments fetched from the post")
+    stale: bool = Field(
+        default=False,
+        description="True if Instagram rate-limited a fresh scrape and an older cached result is returned",
+    )
+
+
+class BatchFetchCommentsRequest(BaseModel):
+    """Request body for the /api/fetch-comments/batch endpoint.
+
+    Lets the frontend fetch the comments of several posts (e.g. a giveaway
+    run across multiple posts) in a single round-trip.
+    """
+
+    urls: list[HttpUrl] = Field(
+        min_length=1,
+        max_length=10,
+        description="Public Instagram post URLs to fetch comments from (1-10)",
+    )
+    session_id: str = Field(description="Session ID obtained from /api/login")
+
+
+class BatchFetchCommentsItem(BaseModel):
+    """Outcome of fetching the comments of one post within a batch.
+
+    Exactly one of ``result`` and ``error`` is set, so a single failing
+    post does not fail the whole batch.
+    """
+
+    url: str = Field(description="The post URL this outcome belongs to")
+    status_code: int = Field(description="HTTP status the single-post endpoint would have returned")
+    result: FetchCommentsResponse | None = Field(default=None, description="Comment data, if the fetch succeeded")
+    error: str | None = Field(default=None, description="Error message, if the fetch failed")
+
+
+class BatchFetchCommentsResponse(BaseModel):
+    """Response body returned by /api/fetch-comments/batch.
+
+    Contains one outcome per requested URL, in request order.
+    """
+
+    results: list[BatchFetchCommentsItem] = Field(description="Per-URL outcomes, in request order")
 
 
 class PickWinnersRequest(BaseModel):
@@ -0,0 +1,78 @@
+"""In-memory per-client rate limiter for the API endpoints.
+
+Counts requests per client IP in fixed one-minute windows so that a single
+client cannot drain the shared Instagram request budget (and get the
+account throttled) for everyone else.
+"""
+
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Length of one counting window. Counters are reset when a new window starts.
+RATE_LIMIT_WINDOW_SECONDS = 60.0
+
+
+class RateLimitExceededError(Exception):
+    """Raised when a client has used up its request budget for the current window.
+
+    Wait until the next window (at most a minute) before retrying.
+    """
+
+
+class RateLimiter:
+    """Thread-safe fixed-window request counter keyed by bucket and client.
+
+    A bucket groups the endpoints that share one budget (e.g. all
+    endpoints that scrape Instagram). All counters belong to the current
+    window and are dropped together when it ends, so memory stays bounded
+    by the number of clients seen within one window.
+    """
+
+    def __init__(self, window_seconds: float = RATE_LIMIT_WINDOW_SECONDS) -> None:
+        self._window_seconds = window_seconds
+        self._window = -1
+        self._counts: dict[tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+
+    def hit(self, bucket: str, client: str, limit: int, cost: int = 1) -> None:
+        """Record ``cost`` requests by ``client`` against ``bucket``.
+
+        Rejected calls are not recorded, so a request that is turned away
+        (e.g. an oversized batch) does not use up the remaining budget.
+
+        Args:
+            bucket: Name of the budget the request counts against.
+            client: Client identifier, typically the remote IP address.
+            limit: Maximum number of requests allowed per window.
+            cost: How many requests this call counts as (e.g. posts in a batch).
+
+        Raises:
+            RateLimitExceededError: If the client exceeded ``limit`` in the
+                current window.
+        """
+        window = int(time.monotonic() // self._window_seconds)
+        key = (bucket, client)
+
+        with self._lock:
+            if window != self._window:
+                self._window = window
+                self._counts.clear()
+            count = self._counts.get(key, 0) + cost
+            if count <= limit:
+                self._counts[key] = count
+
+        if count > limit:
+            logger.warning("Rate limit exceeded for client %s on %s (%d/%d)", client, bucket, count, limit)
+            raise RateLimitExceededError("Too many requests. Please wait a minute and try again.")
+
+    def reset(self) -> None:
+        """Forget all recorded requests."""
+        with self._lock:
+            self._counts.clear()
+
+
+# Module-level singleton used across the application.
+rate_limiter = RateLimiter()
@@ -5,11 +5,14 @@ them by username, producing a deduplicated list of commenters
 with their respective comment counts.
 """
 
+import asyncio
+import functools
+import itertools
 import logging
 import re
 import time
-from collections import Counter
-from dataclasses import dataclass
+from collections import Counter, OrderedDict
+from collections.abc import Iterator
 
 import instaloader
 from instaloader import NodeIterator
@@ -27,14 +30,32 @@ _BACKOFF_MULTIPLIER = 2.0
 
 # Delay between pagination requests to avoid rate limiting
 _PAGINATION_DELAY_SECONDS = 1.0
+# Number of comments consumed between two pagination delays.
+# Instagram typically paginates 12 comments at a time.
+_COMMENTS_PER_PAGE = 12
 # Progressive backoff multiplier for more delays as we fetch more comments
 _COMMENT_COUNT_BACKOFF_THRESHOLD = 50  # After this many comments, increase delays
 _COMMENT_COUNT_BACKOFF_MULTIPLIER = 1.2
+# GraphQL page length used while scraping. Any value above the post's comment
+# count keeps instaloader on the GraphQL endpoint instead of the iPhone
+# endpoint, which Instagram blocks.
+_GRAPHQL_PAGE_LENGTH = 1000
+
+# How long a scraped result is served from memory before the post is
+# scraped again. Repeated checks of the same giveaway (page refreshes,
+# re-rolls) then cost nothing and do not eat into Instagram's rate limit.
+_RESULT_CACHE_TTL_SECONDS = 180.0
+# Maximum number of posts kept in the result cache. The least recently used
+# post is evicted first. Expired results stay cached until evicted so that
+# they can still be served when Instagram rate-limits a fresh scrape.
+_RESULT_CACHE_MAX_ENTRIES = 256
 
 # Matches Instagram post URLs and captures the shortcode.
-# Supports /p/, /reel/, and /tv/ URL formats.
+# Supports /p/, /reel/, and /tv/ URL formats. Anchored at the start so that
+# anything that is not an Instagram URL is rejected after a few characters,
+# and so that Instagram links embedded in other URLs are not accepted.
 _INSTAGRAM_POST_URL_PATTERN = re.compile(
-    r"https?://(?:www\.)?instagram\.com/(?:p|reel|tv)/([A-Za-z0-9_-]+)",
+    r"^https?://(?:www\.)?instagram\.com/(?:p|reel|tv)/([A-Za-z0-9_-]+)",
 )
 
 
@@ -76,24 +97,37 @@ class RateLimitError(ScraperError):
     """
 
 
-@dataclass(frozen=True, slots=True)
-class CommentData:
-    """Raw comment data extracted from an Instagram post.
-
-    Attributes:
-        username: Instagram handle of the commenter (without @).
-        text: Full text content of the comment.
-        timestamp: Unix timestamp when the comment was posted.
-    """
-
-    username: str
-    text: str
-    timestamp: float
-
+# Matches Instagram error messages that indicate a transient, retryable failure.
+_TRANSIENT_ERROR_PATTERN = re.compile(
+    r"something went wrong|try again|temporarily unavailable|server error",
+    re.IGNORECASE,
+)
 
+# Matches Instagram error messages that indicate rate limiting.
+_RATE_LIMIT_ERROR_PATTERN = re.compile(r"429|rate|too many", re.IGNORECASE)
+
+# Results are keyed by (Instagram username of the loader, shortcode), with
+# None as the username of anonymous loaders. What a post's comments reveal
+# depends on the account that fetched them (e.g. a private account it
+# follows), so results are never shared between accounts.
+_CacheKey = tuple[str | None, str]
+# Key -> (monotonic time the result was cached, aggregated result),
+# ordered from least to most recently used.
+_result_cache: OrderedDict[_CacheKey, tuple[float, FetchCommentsResponse]] = OrderedDict()
+# Key -> scrape that is currently running, so that concurrent requests of
+# one account for the same post share one scrape instead of each hitting
+# Instagram. Both dicts are only touched from the event loop, so they need
+# no lock.
+_inflight_scrapes: dict[_CacheKey, asyncio.Task[FetchCommentsResponse]] = {}
+
+
+@functools.lru_cache(maxsize=1024)
 def extract_shortcode(url: str) -> str:
     """Extract the post shortcode from an Instagram URL.
 
+    Cached, since the same giveaway post is typically requested many times.
+    Invalid URLs are not cached: the error is raised again on every call.
+
     Args:
         url: Full Instagram post URL (supports /p/, /reel/, /tv/ paths).
 
@@ -103,7 +137,9 @@ def extract_shortcode(url: str) -> str:
     Raises:
         InvalidURLError: If the URL does not match any known Instagram post format.
     """
-    match = _INSTAGRAM_POST_URL_PATTERN.search(url)
+    # Invalid URLs are never cached, so reject the obvious ones with a plain
+    # substring check before entering the regex engine.
+    match = _INSTAGRAM_POST_URL_PATTERN.match(url) if "instagram.com" in url else None
     if not match:
         raise InvalidURLError(
             f"Could not extract shortcode from URL: {url!r}. Expected format: https://www.instagram.com/p/<shortcode>/"
@@ -124,14 +160,7 @@ def _is_transient_error(exc: instaloader.exceptions.ConnectionException) -> bool
     Returns:
         True if the error message suggests a transient failure.
     """
-    error_msg = str(exc).lower()
-    transient_indicators = [
-        "something went wrong",
-        "try again",
-        "temporarily unavailable",
-        "server error",
-    ]
-    return any(indicator in error_msg for indicator in transient_indicators)
+    return _TRANSIENT_ERROR_PATTERN.search(str(exc)) is not None
 
 
 def _is_rate_limit_error(exc: instaloader.exceptions.ConnectionException) -> bool:
@@ -143,26 +172,91 @@ def _is_rate_limit_error(exc: instaloader.exceptions.ConnectionException) -> boo
     Returns:
         True if the error message suggests the request was rate-limited.
     """
-    error_msg = str(exc).lower()
-    return "429" in error_msg or "rate" in error_msg or "too many" in error_msg
+    return _RATE_LIMIT_ERROR_PATTERN.search(str(exc)) is not None
+
+
+class _GraphQLPageLengthOverride:
+    """Reference-counted override of instaloader's GraphQL page length.
+
+    ``NodeIterator`` reads the page length from a class attribute, both when
+    ``Post.get_comments`` picks an endpoint and on every page query, so it
+    cannot be set per iterator. Concurrent scrapes therefore share a single
+    override: the first scrape to enter sets it and the last one to leave
+    restores the original value. Restoring on every exit would shrink the
+    pages of scrapes still running, and saving the value on every entry
+    could "restore" the override itself permanently.
+
+    Only entered and left on the event loop, so it needs no lock.
+    """
+
+    def __init__(self, page_length: int) -> None:
+        self._page_length = page_length
+        self._original_page_length = NodeIterator._graphql_page_length
+        self._active = 0
+
+    def __enter__(self) -> None:
+        if self._active == 0:
+            self._original_page_length = NodeIterator._graphql_page_length
+            NodeIterator._graphql_page_length = self._page_length
+        self._active += 1
+
+    def __exit__(self, *exc_info: object) -> None:
+        self._active -= 1
+        if self._active == 0:
+            NodeIterator._graphql_page_length = self._original_page_length
+
+
+_large_graphql_pages = _GraphQLPageLengthOverride(_GRAPHQL_PAGE_LENGTH)
 
 
-def _fetch_comments_from_post(
+def _start_comment_iteration(post: instaloader.Post) -> Iterator[instaloader.PostComment]:
+    """Start iterating over a post's comments.
+
+    Blocking: instaloader may request the first page of comments here.
+    """
+    return iter(post.get_comments())
+
+
+def _next_comment_page(comment_iterator: Iterator[instaloader.PostComment], page: list[str]) -> None:
+    """Append the authors of up to ``_COMMENTS_PER_PAGE`` comments to ``page``.
+
+    Blocking: instaloader requests the next page from Instagram whenever
+    the current one is exhausted. Appends nothing once all comments have
+    been consumed. Authors are appended one at a time, so if a page request
+    fails midway, the comments consumed before the failure are still in
+    ``page``.
+    """
+    for comment in itertools.islice(comment_iterator, _COMMENTS_PER_PAGE):
+        page.append(comment.owner.username)
+
+
+async def _fetch_comments_from_post(
     shortcode: str,
     loader: instaloader.Instaloader,
-) -> list[CommentData]:
-    """Fetch all comments from an Instagram post via instaloader.
+) -> Counter[str]:
+    """Fetch all comments from an Instagram post and count them per user.
 
     Uses the provided instaloader instance (which may be authenticated)
     to iterate over every comment on the post. Automatically retries
-    on transient Instagram API errors with exponential backoff.
+    on transient Instagram API errors with exponential backoff, resuming
+    after the comments already counted where instaloader allows it.
+
+    Blocking instaloader calls run in a worker thread one page at a time,
+    while pagination delays and retry backoff are awaited on the event
+    loop, so no thread is tied up while the scraper is only waiting.
+    Instaloader's rate controller only sleeps through short waits in the
+    worker thread; when the server's query budget is used up it raises
+    RateLimitError instead.
+
+    Only the author of each comment is kept: comments are counted as
+    they stream in, so the comment texts are never held in memory.
 
     Args:
         shortcode: The Instagram post shortcode (e.g. 'ABC123').
         loader: A configured Instaloader instance (anonymous or logged-in).
 
     Returns:
-        A list of CommentData objects, one per comment.
+        A Counter mapping each commenter's username to their number of comments.
 
     Raises:
         PostNotFoundError: If the post does not exist or has been deleted.
@@ -171,7 +265,7 @@ def _fetch_comments_from_post(
         ScraperError: For any other unexpected instaloader failure.
     """
     try:
-        post = instaloader.Post.from_shortcode(loader.context, shortcode)
+        post = await asyncio.to_thread(instaloader.Post.from_shortcode, loader.context, shortcode)
     except instaloader.exceptions.QueryReturnedNotFoundException:
         raise PostNotFoundError(
             f"Post with shortcode {shortcode!r} was not found. It may have been deleted or the URL is incorrect."
@@ -189,95 +283,145 @@ def _fetch_comments_from_post(
             f"Failed to fetch post {shortcode!r}: {exc}. Check your network connection and try again."
         ) from exc
 
-    comments: list[CommentData] = []
+    counts: Counter[str] = Counter()
+    fetched = 0
 
     # Temporarily increase GraphQL page length to force using GraphQL endpoint
     # instead of iPhone endpoint which is being blocked by Instagram
-    original_page_length = NodeIterator._graphql_page_length
-    NodeIterator._graphql_page_length = 1000  # High value to always use GraphQL
-
-    for attempt in range(1, _MAX_RETRIES + 1):
-        comments.clear()
-        try:
-            for comment_count, comment in enumerate(post.get_comments()):
-                # Add progressive delay between pagination pages
-                # Instagram typically paginates 12 comments at a time
-                if comment_count > 0 and comment_count % 12 == 0:
-                    base_delay = _PAGINATION_DELAY_SECONDS
+    with _large_graphql_pages:
+        comment_iterator: Iterator[instaloader.PostComment] | None = None
+        for attempt in range(1, _MAX_RETRIES + 1):
+            page: list[str] = []
+            try:
+                if comment_iterator is None:
+                    comment_iterator = await asyncio.to_thread(_start_comment_iteration, post)
+                while True:
+                    page = []
+                    await asyncio.to_thread(_next_comment_page, comment_iterator, page)
+                    counts.update(page)
+                    fetched += len(page)
+                    if len(page) < _COMMENTS_PER_PAGE:
+                        break
+
+                    # Add progressive delay between pagination pages
+                    actual_delay = _PAGINATION_DELAY_SECONDS
 
                     # Add extra delay for large comment sections
-                    if comment_count > _COMMENT_COUNT_BACKOFF_THRESHOLD:
-                        extra_backoff = comment_count // _COMMENT_COUNT_BACKOFF_THRESHOLD
-                        actual_delay = base_delay * (_COMMENT_COUNT_BACKOFF_MULTIPLIER**extra_backoff)
-                    else:
-                        actual_delay = base_delay
-
-                    time.sleep(actual_delay)
-
-                comments.append(
-                    CommentData(
-                        username=comment.owner.username,
-                        text=comment.text,
-                        timestamp=comment.created_at_utc.timestamp(),
-                    )
+                    if fetched > _COMMENT_COUNT_BACKOFF_THRESHOLD:
+                        extra_backoff = fetched // _COMMENT_COUNT_BACKOFF_THRESHOLD
+                        actual_delay *= _COMMENT_COUNT_BACKOFF_MULTIPLIER**extra_backoff
+
+                    await asyncio.sleep(actual_delay)
+
+                # All comments fetched successfully — exit the retry loop.
+                logger.info("Successfully fetched %d comments", fetched)
+                break
+
+            except instaloader.exceptions.ConnectionException as exc:
+                # Count the comments consumed before the failed page request.
+                counts.update(page)
+                fetched += len(page)
+
+                if _is_rate_limit_error(exc):
+                    raise RateLimitError(
+                        "Instagram rate-limited the request while fetching comments. "
+                        "Please wait a few minutes and try again."
+                    ) from exc
+
+                if not _is_transient_error(exc) or attempt == _MAX_RETRIES:
+                    raise ScraperError(
+                        f"Error while fetching comments for post {shortcode!r}: {exc}. "
+                        f"Fetched {fetched} comments before error occurred. "
+                        "Some comments may have been missed."
+                    ) from exc
+
+                # A NodeIterator keeps its position when a page request fails,
+                # so the next attempt resumes after the comments counted so far
+                # instead of paying for the pages already fetched again. Other
+                # iterators (instaloader's generator-based endpoints) are
+                # finished once they raise: start those over.
+                if not isinstance(comment_iterator, NodeIterator):
+                    comment_iterator = None
+                    counts.clear()
+                    fetched = 0
+
+                backoff = _INITIAL_BACKOFF_SECONDS * (_BACKOFF_MULTIPLIER ** (attempt - 1))
+                logger.warning(
+                    "Transient error fetching comments for post %s (attempt %d/%d): %s. "
+                    "Currently have %d comments. Retrying in %.1fs…",
+                    shortcode,
+                    attempt,
+                    _MAX_RETRIES,
+                    exc,
+                    fetched,
+                    backoff,
                 )
+                await asyncio.sleep(backoff)
+
+    logger.info("Fetched %d comments from post %s", fetched, shortcode)
+    return counts
+
 
-            # All comments fetched successfully — exit the retry loop.
-            logger.info("Successfully fetched %d comments", len(comments))
-            break
-
-        except instaloader.exceptions.ConnectionException as exc:
-            if _is_rate_limit_error(exc):
-                raise RateLimitError(
-                    "Instagram rate-limited the request while fetching comments. "
-                    "Please wait a few minutes and try again."
-                ) from exc
-
-            if not _is_transient_error(exc) or attempt == _MAX_RETRIES:
-                raise ScraperError(
-                    f"Error while fetching comments for post {shortcode!r}: {exc}. "
-                    f"Fetched {len(comments)} comments before error occurred. "
-                    "Some comments may have been missed."
-                ) from exc
-
-            backoff = _INITIAL_BACKOFF_SECONDS * (_BACKOFF_MULTIPLIER ** (attempt - 1))
-            logger.warning(
-                "Transient error fetching comments for post %s (attempt %d/%d): %s. "
-                "Currently have %d comments. Retrying in %.1fs…",
-                shortcode,
-                attempt,
-                _MAX_RETRIES,
-                exc,
-                len(comments),
-                backoff,
-            )
-            time.sleep(backoff)
-
-    # Restore original page length
-    NodeIterator._graphql_page_length = original_page_length
-
-    logger.info("Fetched %d comments from post %s", len(comments), shortcode)
-    return comments
-
-
-def _aggregate_comments(comments: list[CommentData]) -> list[CommentUserData]:
-    """Aggregate raw comments into per-user comment counts.
+def _aggregate_comments(counts: Counter[str]) -> list[CommentUserData]:
+    """Convert per-user comment counts into the response representation.
 
     Args:
-        comments: List of raw comment data from the post.
+        counts: Number of comments per username, as fetched from the post.
 
     Returns:
         A list of CommentUserData, sorted alphabetically by username,
         each containing the total number of comments that user left.
     """
-    counts: Counter[str] = Counter(c.username for c in comments)
-    return sorted(
-        [CommentUserData(username=username, comment_count=count) for username, count in counts.items()],
-        key=lambda u: u.username,
+    # The counts come straight from our own aggregation (usernames are
+    # strings, counts >= 1), so skip per-field validation: on posts with
+    # tens of thousands of commenters it dominates the response build.
+    # Sorting the plain username strings avoids a Python key function call
+    # per user.
+    return [
+        CommentUserData.model_construct(username=username, comment_count=counts[username])
+        for username in sorted(counts)
+    ]
+
+
+async def _scrape_post(key: _CacheKey, loader: instaloader.Instaloader) -> FetchCommentsResponse:
+    """Scrape and aggregate the comments of a single post, then cache the result.
+
+    Args:
+        key: Cache key of the post, ``(loader username, shortcode)``.
+        loader: A configured Instaloader instance (anonymous or logged-in).
+
+    Returns:
+        FetchCommentsResponse with deduplicated user list and total comment count.
+    """
+    shortcode = key[1]
+    logger.info("Scraping comments for post shortcode: %s", shortcode)
+
+    try:
+        counts = await _fetch_comments_from_post(shortcode, loader)
+    finally:
+        _inflight_scrapes.pop(key, None)
+
+    users = _aggregate_comments(counts)
+
+    response = FetchCommentsResponse.model_construct(
+        users=users,
+        total_comments=counts.total(),
     )
 
+    _result_cache[key] = (time.monotonic(), response)
+    _result_cache.move_to_end(key)
+    while len(_result_cache) > _RESULT_CACHE_MAX_ENTRIES:
+        _result_cache.popitem(last=False)
 
-def fetch_comments(
+    logger.info(
+        "Completed scraping: %d unique users, %d total comments",
+        len(response.users),
+        response.total_comments,
+    )
+    return response
+
+
+async def fetch_comments(
     url: str,
     loader: instaloader.Instaloader,
 ) -> FetchCommentsResponse:
@@ -285,6 +429,11 @@ def fetch_comments(
 
     This is the main entry point used by the API endpoint. It orchestrates
     URL parsing, comment fetching, and aggregation into the response model.
+    Results are cached per account and post for ``_RESULT_CACHE_TTL_SECONDS``,
+    and concurrent calls of one account for the same post wait for a single
+    shared scrape.
+    If Instagram rate-limits a fresh scrape, an expired cached result is
+    returned instead, marked with ``stale=True``.
 
     Args:
         url: Full Instagram post URL.
@@ -297,23 +446,33 @@ def fetch_comments(
         InvalidURLError: If the URL format is not recognised.
         PostNotFoundError: If the post does not exist.
         PrivatePostError: If the post is on a private account.
-        RateLimitError: If Instagram throttles the request.
+        RateLimitError: If Instagram throttles the request and no earlier
+            result for the post is cached.
         ScraperError: For any other scraping failure.
     """
     shortcode = extract_shortcode(url)
-    logger.info("Scraping comments for post shortcode: %s", shortcode)
-
-    comments = _fetch_comments_from_post(shortcode, loader)
-    users = _aggregate_comments(comments)
-
-    response = FetchCommentsResponse(
-        users=users,
-        total_comments=len(comments),
-    )
+    key = (loader.context.username, shortcode)
+
+    cached = _result_cache.get(key)
+    if cached is not None:
+        _result_cache.move_to_end(key)
+        if time.monotonic() - cached[0] <= _RESULT_CACHE_TTL_SECONDS:
+            logger.info("Serving cached comments for post shortcode: %s", shortcode)
+            return cached[1]
+
+    scrape = _inflight_scrapes.get(key)
+    if scrape is None:
+        scrape = asyncio.create_task(_scrape_post(key, loader))
+        _inflight_scrapes[key] = scrape
+    else:
+        logger.info("Waiting for in-flight scrape of post shortcode: %s", shortcode)
 
-    logger.info(
-        "Completed scraping: %d unique users, %d total comments",
-        len(response.users),
-        response.total_comments,
-    )
-    return response
+    try:
+        # Shielded so that one client disconnecting does not cancel the scrape
+        # for the other requests waiting on it.
+        return await asyncio.shield(scrape)
+    except RateLimitError:
+        if cached is None:
+            raise
+        logger.warning("Rate limited, serving stale cached comments for post shortcode: %s", shortcode)
+        return cached[1].model_copy(update={"stale": True})
@@ -1,23 +1,52 @@
 """In-memory session store for authenticated Instaloader instances.
 
-Maps UUID session IDs to logged-in Instaloader instances so that
+Maps random session IDs to logged-in Instaloader instances so that
 authenticated scraping requests can reuse existing Instagram sessions
 without re-authenticating on every API call.
+
+Sessions live in the memory of the current process: they do not survive a
+restart and are not shared between Uvicorn workers, so the app must be run
+with a single worker. Storing them externally (e.g. in Redis) would mean
+re-creating and re-validating the Instaloader instance on every request,
+which costs an Instagram round-trip per API call.
 """
 
+import heapq
 import logging
-import uuid
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Mapping
 from dataclasses import dataclass, field
-from datetime import UTC, datetime, timedelta
+from types import MappingProxyType
+from typing import Any, ClassVar
 
 import instaloader
 from instaloader import RateController
 
+from backend.scraper import RateLimitError
+
 logger = logging.getLogger(__name__)
 
-# Sessions older than this are considered expired and will be removed
-# during periodic cleanup.
-SESSION_TTL = timedelta(minutes=30)
+# Sessions left unused for longer than this are considered expired and will
+# be removed during periodic cleanup. Compared against time.monotonic()
+# deltas, which are cheap to compute and immune to wall-clock adjustments.
+SESSION_TTL_SECONDS = 30 * 60.0
+# Sessions expire this long after login even while they are in use.
+SESSION_MAX_AGE_SECONDS = 12 * 60 * 60.0
+# Maximum number of sessions kept at once. Each holds an Instaloader with its
+# own HTTP connection pool; when full, the least recently used session is
+# evicted so that a burst of logins cannot exhaust memory or sockets.
+MAX_SESSIONS = 1000
+# ``last_used`` is only refreshed once it is older than this, so a burst of
+# requests does not rewrite it every time. Sessions may therefore expire up
+# to this much earlier than SESSION_TTL_SECONDS after their last request.
+_LAST_USED_UPDATE_THRESHOLD_SECONDS = 60.0
+# Longest wait the rate controller sleeps through in a worker thread. Once the
+# shared query budget is used up, the wait is several minutes: fail the
+# request with RateLimitError instead of blocking a worker thread that long.
+_MAX_QUERY_WAIT_SECONDS = 15.0
 
 
 class _ConservativeRateController(RateController):
@@ -25,23 +54,105 @@ class _ConservativeRateController(RateController):
 
     Reduces default Instagram API rate limits to avoid being blocked
     when fetching large numbers of comments.
+
+    The query history is shared by the controllers of all sessions: every
+    session sends its requests from this server's IP address, so a
+    per-session budget would let concurrent sessions together exceed the
+    limit and run into HTTP 429. Logins and scrapes of different sessions
+    run in different worker threads, so the shared history is only read and
+    updated while holding ``_lock``. A query is recorded at its planned send
+    time in the same critical section that computed its wait, so threads
+    checking the budget meanwhile already count it and the budget is never
+    overshot.
+
+    Waits longer than ``_MAX_QUERY_WAIT_SECONDS`` raise ``RateLimitError``
+    instead of sleeping, so an exhausted budget cannot tie up the worker
+    threads that logins and scrapes share.
     """
 
-    def count_per_sliding_window(self, query_type: str) -> int:
-        """Reduce default limits by ~40% for reliability."""
-        # Default limits: GraphQL=200/11min, Other=75/11min, iPhone=199/30min
-        conservative_limits = {
+    # Default limits: GraphQL=200/11min, Other=75/11min, iPhone=199/30min
+    _LIMITS: ClassVar[Mapping[str, int]] = MappingProxyType(
+        {
             "graphql": 120,  # reduced from 200
             "other": 45,  # reduced from 75
             "iphone": 120,  # reduced from 199
         }
-        return conservative_limits.get(query_type, 50)
+    )
+    _DEFAULT_LIMIT: ClassVar[int] = 50
+
+    _shared_query_timestamps: ClassVar[dict[str, list[float]]] = {}
+    # Reentrant, since wait_before_query calls query_waittime while holding it.
+    _lock: ClassVar[threading.RLock] = threading.RLock()
+
+    def __init__(self, context: instaloader.InstaloaderContext) -> None:
+        super().__init__(context)
+        self._query_timestamps = _ConservativeRateController._shared_query_timestamps
+
+    def count_per_sliding_window(self, query_type: str) -> int:
+        """Reduce default limits by ~40% for reliability."""
+        return self._LIMITS.get(query_type, self._DEFAULT_LIMIT)
 
     def query_waittime(self, query_type: str, current_time: float, untracked_queries: bool = False) -> float:
         """Add extra buffer time to the calculated wait."""
-        base_wait = super().query_waittime(query_type, current_time, untracked_queries)
+        with self._lock:
+            base_wait = super().query_waittime(query_type, current_time, untracked_queries)
         return base_wait * 1.5  # 50% extra buffer
 
+    def wait_before_query(self, query_type: str) -> None:
+        """Reserve a slot in the shared budget, then wait until it is due.
+
+        Unlike ``RateController.wait_before_query``, the query is recorded
+        before sleeping, at the time it will be sent, in the same critical
+        section that computed the wait. A wait too long to sleep through
+        reserves nothing, as ``sleep`` then raises.
+        """
+        with self._lock:
+            now = time.monotonic()
+            waittime = self.query_waittime(query_type, now)
+            if waittime <= _MAX_QUERY_WAIT_SECONDS:
+                self._query_timestamps.setdefault(query_type, []).append(now + waittime)
+        if waittime > 0:
+            self.sleep(waittime)
+
+    def sleep(self, secs: float) -> None:
+        """Sleep through a short wait, but fail fast on a long one.
+
+        Raises:
+            RateLimitError: If the wait exceeds ``_MAX_QUERY_WAIT_SECONDS``.
+        """
+        if secs > _MAX_QUERY_WAIT_SECONDS:
+            logger.warning("Instagram query budget used up, next query allowed in %.0fs", secs)
+            raise RateLimitError(
+                "Too many Instagram requests from this server. Please wait a few minutes and try again."
+            )
+        time.sleep(secs)
+
+    def _dump_query_timestamps(self, current_time: float, failed_query_type: str) -> None:
+        """Log the shared query history after an HTTP 429, under the lock."""
+        with self._lock:
+            super()._dump_query_timestamps(current_time, failed_query_type)
+
+
+# Options of every session's Instaloader: scraping only, nothing is
+# downloaded or written to disk.
+_LOADER_KWARGS: dict[str, Any] = {
+    "download_pictures": False,
+    "download_videos": False,
+    "download_video_thumbnails": False,
+    "download_geotags": False,
+    "download_comments": False,
+    "save_metadata": False,
+    "compress_json": False,
+    # Report through logging only: a non-quiet loader prints progress to
+    # stdout and repeats its error log on stderr when closed.
+    "quiet": True,
+    # Rate limiting configurations for reliability
+    "sleep": True,
+    "max_connection_attempts": 10,
+    "request_timeout": 300.0,
+    "rate_controller": _ConservativeRateController,
+}
+
 
 # ---------------------------------------------------------------------------
 # Domain exceptions
@@ -79,14 +190,37 @@ class _SessionEntry:
     Attributes:
         loader: Authenticated Instaloader instance.
         username: Instagram handle resolved during login.
-        created_at: UTC timestamp when the session was created.
-        last_used: UTC timestamp of the most recent access.
+        created_at: ``time.monotonic()`` value when the session was created.
+        last_used: ``time.monotonic()`` value of the most recent access.
     """
 
     loader: instaloader.Instaloader
     username: str
-    created_at: datetime = field(default_factory=lambda: datetime.now(UTC))
-    last_used: datetime = field(default_factory=lambda: datetime.now(UTC))
+    created_at: float = field(default_factory=time.monotonic)
+    last_used: float = field(default_factory=time.monotonic)
+
+    @property
+    def expires_at(self) -> float:
+        """``time.monotonic()`` value after which the session has expired."""
+        return min(self.last_used + SESSION_TTL_SECONDS, self.created_at + SESSION_MAX_AGE_SECONDS)
+
+
+def _close_loader(session_id: str, entry: _SessionEntry) -> None:
+    """Close the Instaloader of a dropped session, releasing its HTTP connections.
+
+    Failures are logged and otherwise ignored: the session is gone either way.
+    A scrape still running with this loader (e.g. a shielded scrape whose
+    request was abandoned) survives the close: ``requests`` only drops the
+    pooled connections, and the next request opens a new one.
+
+    Args:
+        session_id: Session token of the dropped session, for logging.
+        entry: The dropped session entry.
+    """
+    try:
+        entry.loader.close()  # type: ignore[no-untyped-call]
+    except Exception:
+        logger.warning("Failed to close Instaloader of session %s", session_id, exc_info=True)
 
 
 # ---------------------------------------------------------------------------
@@ -97,23 +231,61 @@ class _SessionEntry:
 class SessionStore:
     """Thread-safe in-memory store for authenticated Instaloader sessions.
 
-    Each successful login creates a new session entry keyed by a UUID4 string.
-    Subsequent API calls reference that session ID to retrieve the
-    already-authenticated Instaloader instance.
+    Each successful login creates a new session entry keyed by a random
+    URL-safe token. Subsequent API calls reference that session ID to
+    retrieve the already-authenticated Instaloader instance.
+
+    Logins run in worker threads while lookups and cleanup run on the event
+    loop, so every access to ``_sessions`` holds ``_lock``. The lock is never
+    held across Instagram requests, only for the dict operations themselves.
     """
 
     def __init__(self) -> None:
-        self._sessions: dict[str, _SessionEntry] = {}
+        # Ordered from least to most recently used.
+        self._sessions: OrderedDict[str, _SessionEntry] = OrderedDict()
+        # Min-heap of (expiry time, session_id) so that cleanup only visits
+        # sessions that are actually due. Entries of sessions that were
+        # already removed are skipped when popped, and sessions used since
+        # their entry was pushed are pushed again with their new expiry.
+        self._expiry_heap: list[tuple[float, str]] = []
+        self._lock = threading.Lock()
 
     # -- internal helpers ----------------------------------------------------
 
+    def _add_entry(self, session_id: str, entry: _SessionEntry) -> None:
+        """Store a new session and schedule its expiry.
+
+        Evicts the least recently used session if the store is full.
+
+        Args:
+            session_id: Session token identifying the session.
+            entry: The session entry to store.
+        """
+        evicted: list[tuple[str, _SessionEntry]] = []
+        with self._lock:
+            self._sessions[session_id] = entry
+            heapq.heappush(self._expiry_heap, (entry.expires_at, session_id))
+            while len(self._sessions) > MAX_SESSIONS:
+                evicted.append(self._sessions.popitem(last=False))
+            if len(self._expiry_heap) > 2 * MAX_SESSIONS:
+                # Evicted sessions leave their heap entries behind; drop them
+                # so the heap stays bounded by MAX_SESSIONS as well.
+                self._expiry_heap = [(e.expires_at, sid) for sid, e in self._sessions.items()]
+                heapq.heapify(self._expiry_heap)
+
+        for evicted_id, evicted_entry in evicted:
+            logger.info("Session store full, evicting least recently used session %s", evicted_id)
+            _close_loader(evicted_id, evicted_entry)
+
     def _get_valid_entry(self, session_id: str) -> _SessionEntry:
         """Look up a session and verify it hasn't expired.
 
-        Updates ``last_used`` on success.
+        Refreshes ``last_used`` and the session's least-recently-used
+        position on success, at most once per
+        ``_LAST_USED_UPDATE_THRESHOLD_SECONDS``.
 
         Args:
-            session_id: UUID4 string to look up.
+            session_id: Session token to look up.
 
         Returns:
             The live session entry.
@@ -121,17 +293,23 @@ class SessionStore:
         Raises:
             SessionNotFoundError: If the session does not exist or has expired.
         """
-        entry = self._sessions.get(session_id)
-        if entry is None:
-            raise SessionNotFoundError("Session not found or has expired. Please log in again.")
-
-        now = datetime.now(UTC)
-        if now - entry.created_at > SESSION_TTL:
-            self._sessions.pop(session_id, None)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                raise SessionNotFoundError("Session not found or has expired. Please log in again.")
+
+            expired = now > entry.expires_at
+            if expired:
+                del self._sessions[session_id]
+            elif now - entry.last_used > _LAST_USED_UPDATE_THRESHOLD_SECONDS:
+                entry.last_used = now
+                self._sessions.move_to_end(session_id)
+
+        if expired:
             logger.info("Session %s expired, removing", session_id)
+            _close_loader(session_id, entry)
             raise SessionNotFoundError("Session has expired. Please log in again.")
-
-        entry.last_used = now
         return entry
 
     # -- public API ----------------------------------------------------------
@@ -148,28 +326,16 @@ class SessionStore:
                 active instagram.com browser session.
 
         Returns:
-            A tuple of ``(session_id, username)`` where *session_id* is a
-            UUID4 string for subsequent requests and *username* is the
-            Instagram handle associated with the cookie.
+            A tuple of ``(session_id, username)`` where *session_id* is an
+            unguessable 128-bit token for subsequent requests and *username*
+            is the Instagram handle associated with the cookie.
 
         Raises:
             LoginFailedError: If the cookie is invalid, expired, or does
                 not resolve to an active Instagram session.
+            RateLimitError: If the server's Instagram query budget is used up.
         """
-        loader = instaloader.Instaloader(
-            download_pictures=False,
-            download_videos=False,
-            download_video_thumbnails=False,
-            download_geotags=False,
-            download_comments=False,
-            save_metadata=False,
-            compress_json=False,
-            # Rate limiting configurations for reliability
-            sleep=True,
-            max_connection_attempts=10,
-            request_timeout=300.0,
-            rate_controller=lambda ctx: _ConservativeRateController(ctx),
-        )
+        loader = instaloader.Instaloader(**_LOADER_KWARGS)
 
         loader.context.update_cookies({"sessionid": session_cookie})
         username = loader.test_login()
@@ -183,24 +349,21 @@ class SessionStore:
 
         loader.context.username = username
 
-        session_id = str(uuid.uuid4())
-        self._sessions[session_id] = _SessionEntry(loader=loader, username=username)
+        session_id = secrets.token_urlsafe(16)
+        self._add_entry(session_id, _SessionEntry(loader=loader, username=username))
 
-        logger.info(
-            "Cookie login successful for user %r, session_id=%s",
-            username,
-            session_id,
-        )
+        logger.info("Cookie login successful, session_id=%s", session_id)
+        logger.debug("Session %s belongs to Instagram user %r", session_id, username)
         return session_id, username
 
     def get_client(self, session_id: str) -> instaloader.Instaloader:
         """Retrieve an authenticated Instaloader instance by session ID.
 
-        Updates the ``last_used`` timestamp on every access so that
-        active sessions are not prematurely expired.
+        Refreshes the ``last_used`` timestamp so that active sessions are
+        not expired while in use.
 
         Args:
-            session_id: UUID4 string returned by a previous ``login_with_cookie()`` call.
+            session_id: Session token returned by a previous ``login_with_cookie()`` call.
 
         Returns:
             The authenticated Instaloader instance associated with the session.
@@ -218,7 +381,7 @@ class SessionStore:
         still alive.  Updates the ``last_used`` timestamp.
 
         Args:
-            session_id: UUID4 string to validate.
+            session_id: Session token to validate.
 
         Returns:
             The Instagram username associated with the session.
@@ -234,32 +397,56 @@ class SessionStore:
         Silently ignores unknown session IDs so that logout is idempotent.
 
         Args:
-            session_id: UUID4 string of the session to remove.
+            session_id: Session token of the session to remove.
         """
-        removed = self._sessions.pop(session_id, None)
+        with self._lock:
+            removed = self._sessions.pop(session_id, None)
         if removed is not None:
             logger.info("Session %s removed (logout)", session_id)
+            _close_loader(session_id, removed)
         else:
             logger.debug("Attempted to remove unknown session %s", session_id)
 
     def cleanup_expired(self) -> None:
-        """Remove all sessions that have exceeded the TTL.
+        """Remove all sessions that have been idle too long or reached their maximum age.
 
         Intended to be called periodically (e.g. every few minutes)
         from a background task to prevent unbounded memory growth.
+        Only the sessions that are due are visited, so a sweep that finds
+        nothing to remove costs O(1) regardless of the number of sessions.
         """
-        now = datetime.now(UTC)
-        expired_ids = [sid for sid, entry in self._sessions.items() if now - entry.created_at > SESSION_TTL]
-
-        for sid in expired_ids:
-            self._sessions.pop(sid, None)
-
-        if expired_ids:
-            logger.info(
-                "Cleaned up %d expired session(s): %s",
-                len(expired_ids),
-                expired_ids,
-            )
+        now = time.monotonic()
+        expired: list[tuple[str, _SessionEntry]] = []
+        with self._lock:
+            while self._expiry_heap and self._expiry_heap[0][0] < now:
+                _, sid = heapq.heappop(self._expiry_heap)
+                entry = self._sessions.get(sid)
+                if entry is None:
+                    continue
+                if now > entry.expires_at:
+                    expired.append((sid, entry))
+                else:
+                    heapq.heappush(self._expiry_heap, (entry.expires_at, sid))
+
+            if len(expired) > len(self._sessions) // 2:
+                # Deleting keys never shrinks a dict's hash table; after a
+                # spike of logins, rebuild it so the memory is released.
+                expired_ids = {sid for sid, _ in expired}
+                self._sessions = OrderedDict(
+                    (sid, entry) for sid, entry in self._sessions.items() if sid not in expired_ids
+                )
+            else:
+                for sid, _ in expired:
+                    del self._sessions[sid]
+
+        for sid, entry in expired:
+            _close_loader(sid, entry)
+
+        if expired:
+            logger.info("Cleaned up %d expired session(s)", len(expired))
+            if logger.isEnabledFor(logging.DEBUG):
+                for sid, _ in expired:
+                    logger.debug("Expired session %s removed", sid)
 
 
 # Module-level singleton used across the application.
@@ -1,9 +1,29 @@
 """Shared fixtures for Givegram backend tests."""
 
+from collections.abc import AsyncIterator
+
 import pytest
+import pytest_asyncio
+from httpx import ASGITransport, AsyncClient
 
+from backend.main import app
 from backend.models import CommentUserData
 
+BASE_URL = "http://test"
+
+
+@pytest_asyncio.fixture(scope="session", loop_scope="session")
+async def client() -> AsyncIterator[AsyncClient]:
+    """Provide an async HTTP client wired to the FastAPI app.
+
+    Shared by all tests: the app keeps no per-client state, and tests
+    isolate themselves by patching module-level collaborators such as
+    ``backend.main.session_store``.
+    """
+    transport = ASGITransport(app=app)  # type: ignore[arg-type]
+    async with AsyncClient(transport=transport, base_url=BASE_URL) as ac:
+        yield ac
+
 
 @pytest.fixture()
 def sample_users() -> list[CommentUserData]:
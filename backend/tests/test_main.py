@@ -1,14 +1,17 @@
 """Tests for backend.main FastAPI application."""
 
 import asyncio
+import threading
 from collections.abc import AsyncIterator
+from concurrent.futures import ThreadPoolExecutor
 from unittest.mock import MagicMock, patch
 
 import pytest
-from httpx import ASGITransport, AsyncClient
+import pytest_asyncio
+from httpx import AsyncClient
 
-from backend.main import app
 from backend.models import CommentUserData, FetchCommentsResponse
+from backend.rate_limiter import rate_limiter
 from backend.scraper import (
     InvalidURLError,
     PostNotFoundError,
@@ -19,15 +22,11 @@ from backend.scraper import (
 from backend.session_store import LoginFailedError, SessionNotFoundError
 from backend.winner_selector import InsufficientEligibleUsersError
 
-BASE_URL = "http://test"
 
-
-@pytest.fixture()
-async def client() -> AsyncIterator[AsyncClient]:
-    """Provide an async HTTP client wired to the FastAPI app."""
-    transport = ASGITransport(app=app)  # type: ignore[arg-type]
-    async with AsyncClient(transport=transport, base_url=BASE_URL) as ac:
-        yield ac
+@pytest.fixture(autouse=True)
+def _reset_rate_limiter() -> None:
+    """Give every test a fresh per-client request budget."""
+    rate_limiter.reset()
 
 
 # ---------------------------------------------------------------------------
@@ -60,6 +59,16 @@ class TestApiLogin:
         assert resp.status_code == 401
         assert "bad cookie" in resp.json()["detail"]
 
+    @patch("backend.main.session_store")
+    async def test_login_query_budget_exhausted(self, mock_store: MagicMock, client: AsyncClient) -> None:
+        """Return 429 when the server's Instagram query budget is used up."""
+        mock_store.login_with_cookie.side_effect = RateLimitError("budget used up")
+
+        resp = await client.post("/api/login", json={"session_cookie": "cookie_val"})
+
+        assert resp.status_code == 429
+        assert "budget used up" in resp.json()["detail"]
+
 
 # ---------------------------------------------------------------------------
 # POST /api/logout
@@ -145,6 +154,31 @@ class TestApiFetchComments:
         assert resp.status_code == 200
         assert resp.json()["total_comments"] == 2
 
+    @patch("backend.main.fetch_comments")
+    @patch("backend.main.session_store")
+    async def test_large_response_is_compressed(
+        self,
+        mock_store: MagicMock,
+        mock_fetch: MagicMock,
+        client: AsyncClient,
+    ) -> None:
+        """Gzip large comment lists when the client accepts it."""
+        mock_store.get_client.return_value = MagicMock()
+        mock_fetch.return_value = FetchCommentsResponse(
+            users=[CommentUserData(username=f"user{i}", comment_count=1) for i in range(200)],
+            total_comments=200,
+        )
+
+        resp = await client.post(
+            "/api/fetch-comments",
+            json={"url": "https://www.instagram.com/p/ABC123/", "session_id": "sid"},
+            headers={"Accept-Encoding": "gzip"},
+        )
+
+        assert resp.status_code == 200
+        assert resp.headers["content-encoding"] == "gzip"
+        assert len(resp.json()["users"]) == 200
+
     @patch("backend.main.session_store")
     async def test_session_not_found(self, mock_store: MagicMock, client: AsyncClient) -> None:
         """Return 401 when the session is missing."""
@@ -258,6 +292,142 @@ class TestApiFetchComments:
         assert resp.status_code == 502
         assert "boom" in resp.json()["detail"]
 
+    @patch("backend.main.fetch_comments")
+    @patch("backend.main.session_store")
+    async def test_client_rate_limited(
+        self,
+        mock_store: MagicMock,
+        mock_fetch: MagicMock,
+        client: AsyncClient,
+    ) -> None:
+        """Return 429 without scraping once the client exhausts its budget."""
+        mock_store.get_client.return_value = MagicMock()
+        mock_fetch.return_value = FetchCommentsResponse(users=[], total_comments=0)
+        payload = {"url": "https://www.instagram.com/p/ABC123/", "session_id": "sid"}
+
+        with patch("backend.main._SCRAPE_RATE_LIMIT", 2):
+            statuses = [(await client.post("/api/fetch-comments", json=payload)).status_code for _ in range(3)]
+
+        assert statuses == [200, 200, 429]
+        assert mock_fetch.call_count == 2
+
+    @patch("backend.main.fetch_comments")
+    @patch("backend.main.session_store")
+    async def test_invalid_session_not_charged(
+        self,
+        mock_store: MagicMock,
+        mock_fetch: MagicMock,
+        client: AsyncClient,
+    ) -> None:
+        """Leave the client's scrape budget untouched when the session is invalid."""
+        mock_store.get_client.side_effect = [SessionNotFoundError("gone"), SessionNotFoundError("gone"), MagicMock()]
+        mock_fetch.return_value = FetchCommentsResponse(users=[], total_comments=0)
+        payload = {"url": "https://www.instagram.com/p/ABC123/", "session_id": "sid"}
+
+        with patch("backend.main._SCRAPE_RATE_LIMIT", 1):
+            statuses = [(await client.post("/api/fetch-comments", json=payload)).status_code for _ in range(3)]
+
+        assert statuses == [401, 401, 200]
+
+
+# ---------------------------------------------------------------------------
+# POST /api/fetch-comments/batch
+# ---------------------------------------------------------------------------
+
+
+class TestApiFetchCommentsBatch:
+    """Tests for the /api/fetch-comments/batch endpoint."""
+
+    @patch("backend.main.fetch_comments")
+    @patch("backend.main.session_store")
+    async def test_mixed_outcomes(
+        self,
+        mock_store: MagicMock,
+        mock_fetch: MagicMock,
+        client: AsyncClient,
+    ) -> None:
+        """Report per-URL outcomes without failing the whole batch."""
+        mock_store.get_client.return_value = MagicMock()
+        outcomes: dict[str, FetchCommentsResponse | Exception] = {
+            "https://www.instagram.com/p/OK/": FetchCommentsResponse(
+                users=[CommentUserData(username="alice", comment_count=2)],
+                total_comments=2,
+            ),
+            "https://www.instagram.com/p/GONE/": PostNotFoundError("missing"),
+            "https://www.instagram.com/p/BOOM/": ScraperError("boom"),
+        }
+
+        def fake_fetch(url: str, loader: MagicMock) -> FetchCommentsResponse:
+            outcome = outcomes[url]
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+
+        mock_fetch.side_effect = fake_fetch
+
+        resp = await client.post(
+            "/api/fetch-comments/batch",
+            json={"urls": list(outcomes), "session_id": "sid"},
+        )
+
+        assert resp.status_code == 200
+        results = resp.json()["results"]
+        assert [r["url"] for r in results] == list(outcomes)
+        assert [r["status_code"] for r in results] == [200, 404, 502]
+        assert results[0]["result"]["total_comments"] == 2
+        assert results[0]["error"] is None
+        assert results[1]["result"] is None
+        assert "missing" in results[1]["error"]
+
+    @patch("backend.main.session_store")
+    async def test_session_not_found(self, mock_store: MagicMock, client: AsyncClient) -> None:
+        """Return 401 when the session is missing."""
+        mock_store.get_client.side_effect = SessionNotFoundError("gone")
+
+        resp = await client.post(
+            "/api/fetch-comments/batch",
+            json={"urls": ["https://www.instagram.com/p/ABC123/"], "session_id": "bad"},
+        )
+
+        assert resp.status_code == 401
+        assert "gone" in resp.json()["detail"]
+
+    @patch("backend.main.fetch_comments")
+    @patch("backend.main.session_store")
+    async def test_each_post_counts_against_rate_limit(
+        self,
+        mock_store: MagicMock,
+        mock_fetch: MagicMock,
+        client: AsyncClient,
+    ) -> None:
+        """Return 429 when the batch holds more posts than the remaining budget."""
+        urls = [f"https://www.instagram.com/p/POST{i}/" for i in range(3)]
+
+        with patch("backend.main._SCRAPE_RATE_LIMIT", 2):
+            resp = await client.post("/api/fetch-comments/batch", json={"urls": urls, "session_id": "sid"})
+
+        assert resp.status_code == 429
+        mock_fetch.assert_not_called()
+
+    @patch("backend.main.fetch_comments")
+    @patch("backend.main.session_store")
+    async def test_rejected_batch_not_charged(
+        self,
+        mock_store: MagicMock,
+        mock_fetch: MagicMock,
+        client: AsyncClient,
+    ) -> None:
+        """Keep the remaining budget for single scrapes after an oversized batch is rejected."""
+        mock_fetch.return_value = FetchCommentsResponse(users=[], total_comments=0)
+        urls = [f"https://www.instagram.com/p/POST{i}/" for i in range(3)]
+
+        with patch("backend.main._SCRAPE_RATE_LIMIT", 2):
+            batch = await client.post("/api/fetch-comments/batch", json={"urls": urls, "session_id": "sid"})
+            single = await client.post("/api/fetch-comments", json={"url": urls[0], "session_id": "sid"})
+
+        assert batch.status_code == 429
+        assert single.status_code == 200
+
 
 # ---------------------------------------------------------------------------
 # POST /api/pick-winners
@@ -315,6 +485,47 @@ class TestServeIndex:
         resp = await client.get("/")
         assert resp.status_code == 200
         assert "text/html" in resp.headers["content-type"]
+        assert resp.headers["cache-control"] == "no-cache"
+        assert resp.headers["etag"]
+
+    async def test_serve_index_not_modified(self, client: AsyncClient) -> None:
+        """GET / with a matching If-None-Match should return an empty 304."""
+        etag = (await client.get("/")).headers["etag"]
+
+        resp = await client.get("/", headers={"If-None-Match": etag})
+
+        assert resp.status_code == 304
+        assert resp.content == b""
+        assert resp.headers["etag"] == etag
+
+    async def test_serve_index_etag_is_weak(self, client: AsyncClient) -> None:
+        """Send a weak ETag, since GZipMiddleware may re-encode the body."""
+        resp = await client.get("/")
+        assert resp.headers["etag"].startswith('W/"')
+
+    @pytest.mark.parametrize(
+        "if_none_match",
+        ['"other", {tag}', '{tag}, "other"', "*", "{opaque}"],
+    )
+    async def test_serve_index_if_none_match_forms(self, client: AsyncClient, if_none_match: str) -> None:
+        """Match tag lists, the wildcard and strong forms of our ETag weakly."""
+        etag = (await client.get("/")).headers["etag"]
+        header = if_none_match.format(tag=etag, opaque=etag.removeprefix("W/"))
+
+        resp = await client.get("/", headers={"If-None-Match": header})
+
+        assert resp.status_code == 304
+
+    async def test_serve_index_stale_etag(self, client: AsyncClient) -> None:
+        """Serve the full page when If-None-Match lists only other versions."""
+        resp = await client.get("/", headers={"If-None-Match": 'W/"old", "older"'})
+        assert resp.status_code == 200
+
+    async def test_static_assets_require_revalidation(self, client: AsyncClient) -> None:
+        """Static assets should be served with the no-cache policy."""
+        resp = await client.get("/js/app.js")
+        assert resp.status_code == 200
+        assert resp.headers["cache-control"] == "no-cache"
 
 
 # ---------------------------------------------------------------------------
@@ -325,6 +536,12 @@ class TestServeIndex:
 class TestLifespan:
     """Tests for the application lifespan (background cleanup task)."""
 
+    @pytest_asyncio.fixture(autouse=True, loop_scope="session")
+    async def _restore_default_executor(self) -> AsyncIterator[None]:
+        """Give the shared test event loop a working executor after lifespan shut its own down."""
+        yield
+        asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor())
+
     @patch("backend.main._CLEANUP_INTERVAL_SECONDS", 0)
     @patch("backend.main.session_store")
     async def test_lifespan_starts_and_stops_cleanup(self, mock_store: MagicMock) -> None:
@@ -340,3 +557,22 @@ class TestLifespan:
 
         # cleanup_expired should have been called at least once.
         mock_store.cleanup_expired.assert_called()
+
+    async def test_lifespan_uses_bounded_worker_pool(self) -> None:
+        """Run asyncio.to_thread calls on the app's own, size-capped thread pool."""
+        from backend.main import lifespan
+
+        async with lifespan(MagicMock()):
+            thread_name = await asyncio.to_thread(lambda: threading.current_thread().name)
+
+        assert thread_name.startswith("givegram-worker")
+
+    async def test_lifespan_shuts_down_worker_pool(self) -> None:
+        """Shut the worker pool down when the application stops."""
+        from backend.main import lifespan
+
+        async with lifespan(MagicMock()):
+            pass
+
+        with pytest.raises(RuntimeError, match="shutdown"):
+            await asyncio.to_thread(lambda: None)
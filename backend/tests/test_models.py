@@ -4,6 +4,8 @@ import pytest
 from pydantic import ValidationError
 
 from backend.models import (
+    BatchFetchCommentsItem,
+    BatchFetchCommentsRequest,
     CommentUserData,
     FetchCommentsRequest,
     FetchCommentsResponse,
@@ -110,6 +112,40 @@ class TestFetchCommentsModels:
             FetchCommentsResponse(users=[], total_comments=-1)
 
 
+# ---------------------------------------------------------------------------
+# BatchFetchCommentsRequest / Item
+# ---------------------------------------------------------------------------
+
+
+class TestBatchFetchCommentsModels:
+    """Tests for batch fetch-comments models."""
+
+    def test_request_valid(self) -> None:
+        """Accept a list of valid Instagram URLs."""
+        req = BatchFetchCommentsRequest(
+            urls=["https://www.instagram.com/p/ONE/", "https://www.instagram.com/p/TWO/"],  # type: ignore[list-item]
+            session_id="sid",
+        )
+        assert len(req.urls) == 2
+
+    def test_request_rejects_empty_list(self) -> None:
+        """Reject a batch without any URLs."""
+        with pytest.raises(ValidationError, match="urls"):
+            BatchFetchCommentsRequest(urls=[], session_id="sid")
+
+    def test_request_rejects_oversized_batch(self) -> None:
+        """Reject more than 10 URLs in a single batch."""
+        urls = [f"https://www.instagram.com/p/POST{i}/" for i in range(11)]
+        with pytest.raises(ValidationError, match="urls"):
+            BatchFetchCommentsRequest(urls=urls, session_id="sid")  # type: ignore[arg-type]
+
+    def test_item_defaults(self) -> None:
+        """Leave result and error unset unless provided."""
+        item = BatchFetchCommentsItem(url="https://www.instagram.com/p/X/", status_code=404, error="missing")
+        assert item.result is None
+        assert item.error == "missing"
+
+
 # ---------------------------------------------------------------------------
 # PickWinnersRequest / Response
 # ---------------------------------------------------------------------------
@@ -0,0 +1,64 @@
+"""Tests for backend.rate_limiter per-client request budgets."""
+
+from unittest.mock import patch
+
+import pytest
+
+from backend.rate_limiter import RateLimiter, RateLimitExceededError
+
+
+class TestRateLimiter:
+    """Tests for the RateLimiter fixed-window counter."""
+
+    def test_allows_requests_up_to_limit(self) -> None:
+        """Accept exactly ``limit`` requests within one window."""
+        limiter = RateLimiter()
+        for _ in range(3):
+            limiter.hit("scrape", "1.2.3.4", limit=3)
+
+    def test_rejects_requests_over_limit(self) -> None:
+        """Raise once the client goes over its budget."""
+        limiter = RateLimiter()
+        limiter.hit("scrape", "1.2.3.4", limit=1)
+
+        with pytest.raises(RateLimitExceededError, match="Too many requests"):
+            limiter.hit("scrape", "1.2.3.4", limit=1)
+
+    def test_cost_counts_multiple_requests(self) -> None:
+        """Charge ``cost`` requests for a single call."""
+        limiter = RateLimiter()
+        limiter.hit("scrape", "1.2.3.4", limit=5, cost=4)
+
+        with pytest.raises(RateLimitExceededError):
+            limiter.hit("scrape", "1.2.3.4", limit=5, cost=2)
+
+    def test_rejected_calls_are_not_charged(self) -> None:
+        """Leave the remaining budget untouched when a call is rejected."""
+        limiter = RateLimiter()
+        limiter.hit("scrape", "1.2.3.4", limit=5, cost=1)
+
+        with pytest.raises(RateLimitExceededError):
+            limiter.hit("scrape", "1.2.3.4", limit=5, cost=10)
+        limiter.hit("scrape", "1.2.3.4", limit=5, cost=4)
+
+    def test_budgets_are_per_client_and_bucket(self) -> None:
+        """Keep separate counters for each client and each bucket."""
+        limiter = RateLimiter()
+        limiter.hit("scrape", "1.2.3.4", limit=1)
+        limiter.hit("scrape", "5.6.7.8", limit=1)
+        limiter.hit("login", "1.2.3.4", limit=1)
+
+    def test_new_window_resets_counts(self) -> None:
+        """Forget previous requests once the window rolls over."""
+        limiter = RateLimiter(window_seconds=60.0)
+        with patch("backend.rate_limiter.time.monotonic", return_value=100.0):
+            limiter.hit("scrape", "1.2.3.4", limit=1)
+        with patch("backend.rate_limiter.time.monotonic", return_value=160.0):
+            limiter.hit("scrape", "1.2.3.4", limit=1)
+
+    def test_reset(self) -> None:
+        """Clear all counters on reset."""
+        limiter = RateLimiter()
+        limiter.hit("scrape", "1.2.3.4", limit=1)
+        limiter.reset()
+        limiter.hit("scrape", "1.2.3.4", limit=1)
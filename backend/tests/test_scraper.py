@@ -1,14 +1,18 @@
 """Tests for backend.scraper module."""
 
+import asyncio
+from collections import Counter
+from collections.abc import Iterator
+from types import SimpleNamespace
 from unittest.mock import MagicMock, patch
 
 import instaloader.exceptions
 import pytest
 from instaloader import NodeIterator
 
+from backend import scraper
 from backend.models import CommentUserData
 from backend.scraper import (
-    CommentData,
     InvalidURLError,
     PostNotFoundError,
     PrivatePostError,
@@ -16,12 +20,22 @@ from backend.scraper import (
     ScraperError,
     _aggregate_comments,
     _fetch_comments_from_post,
+    _GraphQLPageLengthOverride,
     _is_rate_limit_error,
     _is_transient_error,
     extract_shortcode,
     fetch_comments,
 )
 
+
+@pytest.fixture(autouse=True)
+def _clear_result_cache() -> Iterator[None]:
+    """Start every test with an empty scrape-result cache."""
+    scraper._result_cache.clear()
+    yield
+    scraper._result_cache.clear()
+
+
 # ---------------------------------------------------------------------------
 # extract_shortcode
 # ---------------------------------------------------------------------------
@@ -50,6 +64,7 @@ class TestExtractShortcode:
             "https://www.google.com",
             "not-a-url",
             "https://www.instagram.com/stories/user/",
+            "https://example.com/?next=https://www.instagram.com/p/ABC123/",
             "",
         ],
     )
@@ -109,25 +124,17 @@ class TestAggregateComments:
 
     def test_empty(self) -> None:
         """Return an empty list for no comments."""
-        assert _aggregate_comments([]) == []
+        assert _aggregate_comments(Counter()) == []
 
     def test_single_user_multiple_comments(self) -> None:
-        """Aggregate multiple comments from the same user."""
-        comments = [
-            CommentData(username="alice", text="first", timestamp=1.0),
-            CommentData(username="alice", text="second", timestamp=2.0),
-        ]
-        result = _aggregate_comments(comments)
+        """Carry over the comment count of a user with several comments."""
+        result = _aggregate_comments(Counter({"alice": 2}))
         assert len(result) == 1
         assert result[0] == CommentUserData(username="alice", comment_count=2)
 
     def test_sorted_by_username(self) -> None:
         """Return results sorted alphabetically by username."""
-        comments = [
-            CommentData(username="zara", text="hi", timestamp=1.0),
-            CommentData(username="alice", text="hello", timestamp=2.0),
-        ]
-        result = _aggregate_comments(comments)
+        result = _aggregate_comments(Counter({"zara": 1, "alice": 1}))
         assert [u.username for u in result] == ["alice", "zara"]
 
 
@@ -136,73 +143,86 @@ class TestAggregateComments:
 # ---------------------------------------------------------------------------
 
 
-def _make_mock_comment(username: str, text: str, timestamp: float) -> MagicMock:
-    """Create a mock instaloader comment object."""
-    comment = MagicMock()
-    comment.owner.username = username
-    comment.text = text
-    mock_dt = MagicMock()
-    mock_dt.timestamp.return_value = timestamp
-    comment.created_at_utc = mock_dt
-    return comment
+def _make_mock_comment(username: str) -> SimpleNamespace:
+    """Create a stand-in for an instaloader comment object.
+
+    Only ``owner.username`` is read by the scraper, so a plain namespace
+    is enough and much cheaper to build than a MagicMock.
+    """
+    return SimpleNamespace(owner=SimpleNamespace(username=username))
+
+
+class _FlakyNodeIterator(NodeIterator[SimpleNamespace]):
+    """NodeIterator stand-in that raises listed exceptions in place of comments.
+
+    Like the real NodeIterator, it keeps its position when raising, so the
+    next call continues with the following item.
+    """
+
+    def __init__(self, items: list[SimpleNamespace | Exception]) -> None:
+        self._items = iter(items)
+
+    def __next__(self) -> SimpleNamespace:
+        item = next(self._items)
+        if isinstance(item, Exception):
+            raise item
+        return item
 
 
 class TestFetchCommentsFromPost:
     """Tests for _fetch_comments_from_post with mocked instaloader."""
 
-    @patch("backend.scraper.time.sleep")
+    @patch("backend.scraper.asyncio.sleep")
     @patch("backend.scraper.instaloader.Post.from_shortcode")
-    def test_success(self, mock_from_shortcode: MagicMock, mock_sleep: MagicMock) -> None:
-        """Return comment data on a successful fetch."""
+    async def test_success(self, mock_from_shortcode: MagicMock, mock_sleep: MagicMock) -> None:
+        """Return per-user comment counts on a successful fetch."""
         mock_post = MagicMock()
         mock_post.get_comments.return_value = [
-            _make_mock_comment("alice", "nice!", 100.0),
-            _make_mock_comment("bob", "great!", 200.0),
+            _make_mock_comment("alice"),
+            _make_mock_comment("bob"),
         ]
         mock_from_shortcode.return_value = mock_post
 
         loader = MagicMock()
-        comments = _fetch_comments_from_post("ABC123", loader)
+        counts = await _fetch_comments_from_post("ABC123", loader)
 
-        assert len(comments) == 2
-        assert comments[0].username == "alice"
-        assert comments[1].username == "bob"
+        assert counts == Counter({"alice": 1, "bob": 1})
 
     @patch("backend.scraper.instaloader.Post.from_shortcode")
-    def test_post_not_found(self, mock_from_shortcode: MagicMock) -> None:
+    async def test_post_not_found(self, mock_from_shortcode: MagicMock) -> None:
         """Raise PostNotFoundError for QueryReturnedNotFoundException."""
         mock_from_shortcode.side_effect = instaloader.exceptions.QueryReturnedNotFoundException("404")
 
         with pytest.raises(PostNotFoundError, match="was not found"):
-            _fetch_comments_from_post("MISSING", MagicMock())
+            await _fetch_comments_from_post("MISSING", MagicMock())
 
     @patch("backend.scraper.instaloader.Post.from_shortcode")
-    def test_private_post(self, mock_from_shortcode: MagicMock) -> None:
+    async def test_private_post(self, mock_from_shortcode: MagicMock) -> None:
         """Raise PrivatePostError for LoginRequiredException."""
         mock_from_shortcode.side_effect = instaloader.exceptions.LoginRequiredException("private")
 
         with pytest.raises(PrivatePostError, match="private account"):
-            _fetch_comments_from_post("PRIVATE", MagicMock())
+            await _fetch_comments_from_post("PRIVATE", MagicMock())
 
     @patch("backend.scraper.instaloader.Post.from_shortcode")
-    def test_rate_limit_on_post_load(self, mock_from_shortcode: MagicMock) -> None:
+    async def test_rate_limit_on_post_load(self, mock_from_shortcode: MagicMock) -> None:
         """Raise RateLimitError when loading the post hits a rate limit."""
         mock_from_shortcode.side_effect = instaloader.exceptions.ConnectionException("429 Too Many Requests")
 
         with pytest.raises(RateLimitError, match="rate-limiting"):
-            _fetch_comments_from_post("RATELIMITED", MagicMock())
+            await _fetch_comments_from_post("RATELIMITED", MagicMock())
 
     @patch("backend.scraper.instaloader.Post.from_shortcode")
-    def test_generic_connection_error_on_post_load(self, mock_from_shortcode: MagicMock) -> None:
+    async def test_generic_connection_error_on_post_load(self, mock_from_shortcode: MagicMock) -> None:
         """Raise ScraperError for a non-rate-limit ConnectionException during post load."""
         mock_from_shortcode.side_effect = instaloader.exceptions.ConnectionException("network down")
 
         with pytest.raises(ScraperError, match="Failed to fetch post"):
-            _fetch_comments_from_post("BROKEN", MagicMock())
+            await _fetch_comments_from_post("BROKEN", MagicMock())
 
-    @patch("backend.scraper.time.sleep")
+    @patch("backend.scraper.asyncio.sleep")
     @patch("backend.scraper.instaloader.Post.from_shortcode")
-    def test_rate_limit_during_comment_iteration(
+    async def test_rate_limit_during_comment_iteration(
         self,
         mock_from_shortcode: MagicMock,
         mock_sleep: MagicMock,
@@ -213,11 +233,11 @@ class TestFetchCommentsFromPost:
         mock_from_shortcode.return_value = mock_post
 
         with pytest.raises(RateLimitError, match="rate-limited"):
-            _fetch_comments_from_post("RL", MagicMock())
+            await _fetch_comments_from_post("RL", MagicMock())
 
-    @patch("backend.scraper.time.sleep")
+    @patch("backend.scraper.asyncio.sleep")
     @patch("backend.scraper.instaloader.Post.from_shortcode")
-    def test_transient_error_retries_then_fails(
+    async def test_transient_error_retries_then_fails(
         self,
         mock_from_shortcode: MagicMock,
         mock_sleep: MagicMock,
@@ -228,21 +248,21 @@ class TestFetchCommentsFromPost:
         mock_from_shortcode.return_value = mock_post
 
         with pytest.raises(ScraperError, match="Error while fetching comments"):
-            _fetch_comments_from_post("TRANSIENT", MagicMock())
+            await _fetch_comments_from_post("TRANSIENT", MagicMock())
 
         # With _MAX_RETRIES=3, exactly 2 backoff sleeps occur (after attempt 1 and 2).
         assert mock_sleep.call_count == 2
 
-    @patch("backend.scraper.time.sleep")
+    @patch("backend.scraper.asyncio.sleep")
     @patch("backend.scraper.instaloader.Post.from_shortcode")
-    def test_transient_error_recovers(
+    async def test_transient_error_recovers(
         self,
         mock_from_shortcode: MagicMock,
         mock_sleep: MagicMock,
     ) -> None:
         """Recover after a transient error on the first attempt."""
         mock_post = MagicMock()
-        comments = [_make_mock_comment("u1", "hi", 1.0)]
+        comments = [_make_mock_comment("u1")]
 
         # First call raises transient error, second succeeds.
         mock_post.get_comments.side_effect = [
@@ -251,13 +271,61 @@ class TestFetchCommentsFromPost:
         ]
         mock_from_shortcode.return_value = mock_post
 
-        result = _fetch_comments_from_post("RECOVER", MagicMock())
-        assert len(result) == 1
-        assert result[0].username == "u1"
+        result = await _fetch_comments_from_post("RECOVER", MagicMock())
+        assert result == Counter({"u1": 1})
+
+    @patch("backend.scraper.asyncio.sleep")
+    @patch("backend.scraper.instaloader.Post.from_shortcode")
+    async def test_transient_error_resumes_node_iterator(
+        self,
+        mock_from_shortcode: MagicMock,
+        mock_sleep: MagicMock,
+    ) -> None:
+        """Resume a NodeIterator after a transient error, keeping comments already counted."""
+        mock_post = MagicMock()
+        mock_post.get_comments.return_value = _FlakyNodeIterator(
+            [
+                _make_mock_comment("alice"),
+                _make_mock_comment("bob"),
+                instaloader.exceptions.ConnectionException("something went wrong"),
+                _make_mock_comment("alice"),
+            ]
+        )
+        mock_from_shortcode.return_value = mock_post
+
+        result = await _fetch_comments_from_post("RESUME", MagicMock())
+
+        assert result == Counter({"alice": 2, "bob": 1})
+        mock_post.get_comments.assert_called_once()
+
+    @patch("backend.scraper.asyncio.sleep")
+    @patch("backend.scraper.instaloader.Post.from_shortcode")
+    async def test_transient_error_restarts_generator(
+        self,
+        mock_from_shortcode: MagicMock,
+        mock_sleep: MagicMock,
+    ) -> None:
+        """Start over when a generator-based comment iterator fails midway."""
+
+        def failing_comments() -> Iterator[SimpleNamespace]:
+            yield _make_mock_comment("alice")
+            raise instaloader.exceptions.ConnectionException("something went wrong")
+
+        mock_post = MagicMock()
+        mock_post.get_comments.side_effect = [
+            failing_comments(),
+            [_make_mock_comment("alice"), _make_mock_comment("bob")],
+        ]
+        mock_from_shortcode.return_value = mock_post
+
+        result = await _fetch_comments_from_post("RESTART", MagicMock())
+
+        assert result == Counter({"alice": 1, "bob": 1})
+        assert mock_post.get_comments.call_count == 2
 
-    @patch("backend.scraper.time.sleep")
+    @patch("backend.scraper.asyncio.sleep")
     @patch("backend.scraper.instaloader.Post.from_shortcode")
-    def test_non_transient_error_does_not_retry(
+    async def test_non_transient_error_does_not_retry(
         self,
         mock_from_shortcode: MagicMock,
         mock_sleep: MagicMock,
@@ -268,28 +336,28 @@ class TestFetchCommentsFromPost:
         mock_from_shortcode.return_value = mock_post
 
         with pytest.raises(ScraperError, match="Error while fetching comments"):
-            _fetch_comments_from_post("NONTRANSIENT", MagicMock())
+            await _fetch_comments_from_post("NONTRANSIENT", MagicMock())
 
         # Non-transient errors should not trigger backoff sleeps.
         mock_sleep.assert_not_called()
 
-    @patch("backend.scraper.time.sleep")
+    @patch("backend.scraper.asyncio.sleep")
     @patch("backend.scraper.instaloader.Post.from_shortcode")
-    def test_pagination_delay(self, mock_from_shortcode: MagicMock, mock_sleep: MagicMock) -> None:
+    async def test_pagination_delay(self, mock_from_shortcode: MagicMock, mock_sleep: MagicMock) -> None:
         """Apply pagination delay when fetching more than 12 comments."""
         mock_post = MagicMock()
         # 13 comments to trigger one pagination delay at index 12.
-        mock_post.get_comments.return_value = [_make_mock_comment(f"user{i}", "text", float(i)) for i in range(13)]
+        mock_post.get_comments.return_value = [_make_mock_comment(f"user{i}") for i in range(13)]
         mock_from_shortcode.return_value = mock_post
 
-        result = _fetch_comments_from_post("PAGINATED", MagicMock())
-        assert len(result) == 13
+        result = await _fetch_comments_from_post("PAGINATED", MagicMock())
+        assert result.total() == 13
         # At least one pagination sleep should have been called.
         assert mock_sleep.called
 
-    @patch("backend.scraper.time.sleep")
+    @patch("backend.scraper.asyncio.sleep")
     @patch("backend.scraper.instaloader.Post.from_shortcode")
-    def test_progressive_backoff_for_large_comment_sections(
+    async def test_progressive_backoff_for_large_comment_sections(
         self,
         mock_from_shortcode: MagicMock,
         mock_sleep: MagicMock,
@@ -297,20 +365,20 @@ class TestFetchCommentsFromPost:
         """Apply progressive backoff when comment count exceeds the threshold."""
         mock_post = MagicMock()
         # 61 comments: triggers progressive backoff at comment indices 60 (> 50 threshold).
-        mock_post.get_comments.return_value = [_make_mock_comment(f"user{i}", "text", float(i)) for i in range(61)]
+        mock_post.get_comments.return_value = [_make_mock_comment(f"user{i}") for i in range(61)]
         mock_from_shortcode.return_value = mock_post
 
-        result = _fetch_comments_from_post("BIGPOST", MagicMock())
-        assert len(result) == 61
+        result = await _fetch_comments_from_post("BIGPOST", MagicMock())
+        assert result.total() == 61
 
         # Check that sleep was called with a value > base delay (progressive backoff).
         sleep_values = [call.args[0] for call in mock_sleep.call_args_list]
         base_delay = 1.0  # _PAGINATION_DELAY_SECONDS
         assert any(v > base_delay for v in sleep_values)
 
-    @patch("backend.scraper.time.sleep")
+    @patch("backend.scraper.asyncio.sleep")
     @patch("backend.scraper.instaloader.Post.from_shortcode")
-    def test_graphql_page_length_restored_after_success(
+    async def test_graphql_page_length_restored_after_success(
         self,
         mock_from_shortcode: MagicMock,
         mock_sleep: MagicMock,
@@ -319,16 +387,16 @@ class TestFetchCommentsFromPost:
         original_value = NodeIterator._graphql_page_length
 
         mock_post = MagicMock()
-        mock_post.get_comments.return_value = [_make_mock_comment("u1", "hi", 1.0)]
+        mock_post.get_comments.return_value = [_make_mock_comment("u1")]
         mock_from_shortcode.return_value = mock_post
 
-        _fetch_comments_from_post("OK", MagicMock())
+        await _fetch_comments_from_post("OK", MagicMock())
 
         assert NodeIterator._graphql_page_length == original_value
 
-    @patch("backend.scraper.time.sleep")
+    @patch("backend.scraper.asyncio.sleep")
     @patch("backend.scraper.instaloader.Post.from_shortcode")
-    def test_graphql_page_length_restored_after_error(
+    async def test_graphql_page_length_restored_after_error(
         self,
         mock_from_shortcode: MagicMock,
         mock_sleep: MagicMock,
@@ -341,7 +409,19 @@ class TestFetchCommentsFromPost:
         mock_from_shortcode.return_value = mock_post
 
         with pytest.raises(ScraperError):
-            _fetch_comments_from_post("FAIL", MagicMock())
+            await _fetch_comments_from_post("FAIL", MagicMock())
+
+        assert NodeIterator._graphql_page_length == original_value
+
+    def test_graphql_page_length_kept_until_last_scrape_finishes(self) -> None:
+        """Keep the override while any overlapping scrape is still running."""
+        original_value = NodeIterator._graphql_page_length
+        override = _GraphQLPageLengthOverride(1000)
+
+        with override:
+            with override:
+                assert NodeIterator._graphql_page_length == 1000
+            assert NodeIterator._graphql_page_length == 1000
 
         assert NodeIterator._graphql_page_length == original_value
 
@@ -351,26 +431,131 @@ class TestFetchCommentsFromPost:
 # ---------------------------------------------------------------------------
 
 
+def _make_loader(username: str | None = "alice") -> MagicMock:
+    """Create a mock Instaloader logged in as ``username`` (None for anonymous)."""
+    loader = MagicMock()
+    loader.context.username = username
+    return loader
+
+
 class TestFetchComments:
     """Tests for the top-level fetch_comments orchestrator."""
 
     @patch("backend.scraper._fetch_comments_from_post")
-    def test_success(self, mock_fetch: MagicMock) -> None:
+    async def test_success(self, mock_fetch: MagicMock) -> None:
         """Return aggregated response for a valid URL."""
-        mock_fetch.return_value = [
-            CommentData(username="alice", text="one", timestamp=1.0),
-            CommentData(username="alice", text="two", timestamp=2.0),
-            CommentData(username="bob", text="three", timestamp=3.0),
-        ]
+        mock_fetch.return_value = Counter({"alice": 2, "bob": 1})
 
-        resp = fetch_comments("https://www.instagram.com/p/TEST123/", MagicMock())
+        resp = await fetch_comments("https://www.instagram.com/p/TEST123/", _make_loader())
 
         assert resp.total_comments == 3
         assert len(resp.users) == 2
         usernames = {u.username for u in resp.users}
         assert usernames == {"alice", "bob"}
 
-    def test_invalid_url_raises(self) -> None:
+    async def test_invalid_url_raises(self) -> None:
         """Raise InvalidURLError for a bad URL before attempting to fetch."""
         with pytest.raises(InvalidURLError):
-            fetch_comments("https://notinstagram.com/oops", MagicMock())
+            await fetch_comments("https://notinstagram.com/oops", _make_loader())
+
+    @patch("backend.scraper._fetch_comments_from_post")
+    async def test_cached_result_reused(self, mock_fetch: MagicMock) -> None:
+        """Serve a repeated request for the same post from the cache."""
+        mock_fetch.return_value = Counter({"alice": 1})
+
+        first = await fetch_comments("https://www.instagram.com/p/CACHED/", _make_loader())
+        second = await fetch_comments("https://instagram.com/p/CACHED", _make_loader())
+
+        assert second is first
+        mock_fetch.assert_called_once()
+
+    @patch("backend.scraper._fetch_comments_from_post")
+    async def test_cached_result_not_shared_between_accounts(self, mock_fetch: MagicMock) -> None:
+        """Scrape again for another account instead of serving the first account's result."""
+        mock_fetch.side_effect = [Counter({"alice": 1}), PrivatePostError("private")]
+        url = "https://www.instagram.com/p/PRIVATE/"
+
+        await fetch_comments(url, _make_loader("follower"))
+        with pytest.raises(PrivatePostError):
+            await fetch_comments(url, _make_loader("stranger"))
+
+        assert mock_fetch.call_count == 2
+
+    @patch("backend.scraper._RESULT_CACHE_TTL_SECONDS", -1.0)
+    @patch("backend.scraper._fetch_comments_from_post")
+    async def test_expired_result_rescraped(self, mock_fetch: MagicMock) -> None:
+        """Scrape the post again once the cached result has expired."""
+        mock_fetch.return_value = Counter({"alice": 1})
+
+        await fetch_comments("https://www.instagram.com/p/EXPIRED/", _make_loader())
+        await fetch_comments("https://www.instagram.com/p/EXPIRED/", _make_loader())
+
+        assert mock_fetch.call_count == 2
+        assert len(scraper._result_cache) == 1
+
+    @patch("backend.scraper._RESULT_CACHE_TTL_SECONDS", -1.0)
+    @patch("backend.scraper._fetch_comments_from_post")
+    async def test_stale_result_served_when_rate_limited(self, mock_fetch: MagicMock) -> None:
+        """Fall back to an expired cached result, flagged stale, when rate-limited."""
+        mock_fetch.side_effect = [Counter({"alice": 2}), RateLimitError("throttled")]
+
+        fresh = await fetch_comments("https://www.instagram.com/p/STALE/", _make_loader())
+        stale = await fetch_comments("https://www.instagram.com/p/STALE/", _make_loader())
+
+        assert not fresh.stale
+        assert stale.stale
+        assert stale.total_comments == 2
+
+    @patch("backend.scraper._RESULT_CACHE_MAX_ENTRIES", 2)
+    @patch("backend.scraper._fetch_comments_from_post")
+    async def test_least_recently_used_result_evicted(self, mock_fetch: MagicMock) -> None:
+        """Evict the least recently used post once the cache is full."""
+        mock_fetch.return_value = Counter({"alice": 1})
+
+        for shortcode in ("ONE", "TWO", "ONE", "THREE"):
+            await fetch_comments(f"https://www.instagram.com/p/{shortcode}/", _make_loader())
+
+        assert list(scraper._result_cache) == [("alice", "ONE"), ("alice", "THREE")]
+        assert mock_fetch.call_count == 3
+
+    @patch("backend.scraper._fetch_comments_from_post")
+    async def test_errors_are_not_cached(self, mock_fetch: MagicMock) -> None:
+        """Retry the scrape on the next request after a failure."""
+        mock_fetch.side_effect = [
+            RateLimitError("throttled"),
+            Counter({"alice": 1}),
+        ]
+
+        with pytest.raises(RateLimitError):
+            await fetch_comments("https://www.instagram.com/p/FLAKY/", _make_loader())
+        resp = await fetch_comments("https://www.instagram.com/p/FLAKY/", _make_loader())
+
+        assert resp.total_comments == 1
+        assert not scraper._inflight_scrapes
+
+    @pytest.mark.parametrize("fails", [False, True])
+    @patch("backend.scraper._fetch_comments_from_post")
+    async def test_concurrent_requests_share_one_scrape(self, mock_fetch: MagicMock, fails: bool) -> None:
+        """Let a request for a post that is already being scraped wait for that scrape."""
+        release_scrape = asyncio.Event()
+
+        async def slow_fetch(shortcode: str, loader: MagicMock) -> Counter[str]:
+            await release_scrape.wait()
+            if fails:
+                raise ScraperError("boom")
+            return Counter({"alice": 1})
+
+        mock_fetch.side_effect = slow_fetch
+        url = "https://www.instagram.com/p/SHARED/"
+
+        first = asyncio.create_task(fetch_comments(url, _make_loader()))
+        second = asyncio.create_task(fetch_comments(url, _make_loader()))
+        await asyncio.sleep(0)
+        release_scrape.set()
+        outcomes = await asyncio.gather(first, second, return_exceptions=True)
+
+        mock_fetch.assert_called_once()
+        if fails:
+            assert all(isinstance(outcome, ScraperError) for outcome in outcomes)
+        else:
+            assert outcomes[0] is outcomes[1]
@@ -1,14 +1,20 @@
 """Tests for backend.session_store module."""
 
-import uuid
-from datetime import UTC, datetime, timedelta
+import logging
+import secrets
+import threading
+import time
+from typing import Any
 from unittest.mock import MagicMock, patch
 
 import pytest
 from instaloader import RateController
 
+from backend.scraper import RateLimitError
 from backend.session_store import (
-    SESSION_TTL,
+    _MAX_QUERY_WAIT_SECONDS,
+    SESSION_MAX_AGE_SECONDS,
+    SESSION_TTL_SECONDS,
     LoginFailedError,
     SessionNotFoundError,
     SessionStore,
@@ -24,7 +30,8 @@ from backend.session_store import (
 def _create_store_with_session(
     *,
     username: str = "testuser",
-    created_at: datetime | None = None,
+    created_at: float | None = None,
+    loader: MagicMock | None = None,
 ) -> tuple[SessionStore, str]:
     """Create a SessionStore and inject a fake session entry.
 
@@ -32,13 +39,12 @@ def _create_store_with_session(
         A tuple of (store, session_id).
     """
     store = SessionStore()
-    mock_loader = MagicMock()
-    entry = _SessionEntry(loader=mock_loader, username=username)
+    entry = _SessionEntry(loader=loader if loader is not None else MagicMock(), username=username)
     if created_at is not None:
         entry.created_at = created_at
         entry.last_used = created_at
-    session_id = str(uuid.uuid4())
-    store._sessions[session_id] = entry
+    session_id = secrets.token_urlsafe(16)
+    store._add_entry(session_id, entry)
     return store, session_id
 
 
@@ -72,6 +78,98 @@ class TestConservativeRateController:
             result = controller.query_waittime("graphql", 0.0)
             assert result == 15.0
 
+    def test_query_history_shared_between_sessions(self) -> None:
+        """Record queries of every session in one shared history."""
+        first = _ConservativeRateController(MagicMock())
+        second = _ConservativeRateController(MagicMock())
+
+        first.wait_before_query("shared-test")
+
+        assert len(second._query_timestamps["shared-test"]) == 1
+        assert second.query_waittime("shared-test", time.monotonic()) == 0.0
+
+    def test_wait_before_query_reserves_slot_then_sleeps(self) -> None:
+        """Record the query at its planned send time, then sleep for the buffered wait."""
+        controller = _ConservativeRateController(MagicMock())
+
+        with (
+            patch.object(RateController, "query_waittime", return_value=8.0),
+            patch.object(controller, "sleep") as mock_sleep,
+        ):
+            before = time.monotonic()
+            controller.wait_before_query("exhausted-test")
+
+        mock_sleep.assert_called_once_with(12.0)
+        (reserved,) = controller._query_timestamps["exhausted-test"]
+        assert reserved >= before + 12.0
+
+    def test_concurrent_queries_never_overshoot_budget(self) -> None:
+        """Let concurrent sessions together record at most the per-window limit."""
+        query_type = "concurrent-test"
+        limit = _ConservativeRateController(MagicMock()).count_per_sliding_window(query_type)
+        now = time.monotonic()
+        _ConservativeRateController._shared_query_timestamps[query_type] = [now] * (limit - 1)
+        controllers = [_ConservativeRateController(MagicMock()) for _ in range(8)]
+        start = threading.Barrier(len(controllers))
+        rate_limited: list[RateLimitError] = []
+        compute_waittime = _ConservativeRateController.query_waittime
+
+        def slow_waittime(self: _ConservativeRateController, *args: Any) -> float:
+            # Hand the GIL to the other threads between checking and recording.
+            waittime = compute_waittime(self, *args)
+            time.sleep(0.01)
+            return waittime
+
+        def query(controller: _ConservativeRateController) -> None:
+            start.wait()
+            try:
+                controller.wait_before_query(query_type)
+            except RateLimitError as exc:
+                rate_limited.append(exc)
+
+        threads = [threading.Thread(target=query, args=(controller,)) for controller in controllers]
+        with patch.object(_ConservativeRateController, "query_waittime", slow_waittime):
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        assert len(_ConservativeRateController._shared_query_timestamps[query_type]) == limit
+        assert len(rate_limited) == len(controllers) - 1
+
+    def test_wait_before_query_raises_when_wait_too_long(self) -> None:
+        """Raise RateLimitError instead of blocking the worker thread for minutes."""
+        controller = _ConservativeRateController(MagicMock())
+
+        with (
+            patch.object(RateController, "query_waittime", return_value=600.0),
+            patch("backend.session_store.time.sleep") as mock_sleep,
+            pytest.raises(RateLimitError),
+        ):
+            controller.wait_before_query("long-wait-test")
+
+        mock_sleep.assert_not_called()
+        assert "long-wait-test" not in controller._query_timestamps
+
+    def test_sleep_waits_out_short_delays(self) -> None:
+        """Sleep in the worker thread when the wait is short."""
+        controller = _ConservativeRateController(MagicMock())
+
+        with patch("backend.session_store.time.sleep") as mock_sleep:
+            controller.sleep(_MAX_QUERY_WAIT_SECONDS)
+
+        mock_sleep.assert_called_once_with(_MAX_QUERY_WAIT_SECONDS)
+
+    def test_dump_query_timestamps(self) -> None:
+        """Log the shared history through the instaloader context."""
+        ctx = MagicMock()
+        controller = _ConservativeRateController(ctx)
+        controller.wait_before_query("dump-test")
+
+        controller._dump_query_timestamps(time.monotonic(), "dump-test")
+
+        assert ctx.error.called
+
 
 # ---------------------------------------------------------------------------
 # SessionStore.login_with_cookie
@@ -92,9 +190,18 @@ class TestLoginWithCookie:
         session_id, username = store.login_with_cookie("valid_cookie")
 
         assert username == "realuser"
-        assert session_id  # non-empty UUID
+        assert session_id  # non-empty token
         mock_loader.context.update_cookies.assert_called_once_with({"sessionid": "valid_cookie"})
 
+    @patch("backend.session_store.instaloader.Instaloader")
+    def test_loader_is_quiet(self, mock_instaloader_cls: MagicMock) -> None:
+        """Create loaders that report through logging instead of printing."""
+        mock_instaloader_cls.return_value.test_login.return_value = "realuser"
+
+        SessionStore().login_with_cookie("valid_cookie")
+
+        assert mock_instaloader_cls.call_args.kwargs["quiet"] is True
+
     @patch("backend.session_store.instaloader.Instaloader")
     def test_login_failed(self, mock_instaloader_cls: MagicMock) -> None:
         """Raise LoginFailedError when test_login returns None."""
@@ -129,14 +236,80 @@ class TestGetClient:
 
     def test_expired_session(self) -> None:
         """Raise SessionNotFoundError when the session has exceeded the TTL."""
-        expired_time = datetime.now(UTC) - SESSION_TTL - timedelta(seconds=1)
-        store, sid = _create_store_with_session(created_at=expired_time)
+        expired_time = time.monotonic() - SESSION_TTL_SECONDS - 1
+        loader = MagicMock()
+        store, sid = _create_store_with_session(created_at=expired_time, loader=loader)
 
         with pytest.raises(SessionNotFoundError, match="expired"):
             store.get_client(sid)
 
-        # Session should have been evicted.
+        # Session should have been evicted and its loader closed.
         assert sid not in store._sessions
+        loader.close.assert_called_once()
+
+    def test_recently_used_session_outlives_ttl(self) -> None:
+        """Keep a session alive past the TTL since login while it is in use."""
+        login_time = time.monotonic() - SESSION_TTL_SECONDS - 1
+        store, sid = _create_store_with_session(created_at=login_time)
+        store._sessions[sid].last_used = time.monotonic() - 10
+
+        assert store.get_client(sid) is store._sessions[sid].loader
+
+    def test_session_expires_at_max_age(self) -> None:
+        """Expire a session at its maximum age even if it was just used."""
+        store, sid = _create_store_with_session(created_at=time.monotonic() - SESSION_MAX_AGE_SECONDS - 1)
+        store._sessions[sid].last_used = time.monotonic()
+
+        with pytest.raises(SessionNotFoundError, match="expired"):
+            store.get_client(sid)
+
+    def test_last_used_refreshed_only_after_threshold(self) -> None:
+        """Skip rewriting last_used for back-to-back requests."""
+        store, sid = _create_store_with_session()
+        entry = store._sessions[sid]
+
+        entry.last_used = recent = time.monotonic() - 5
+        store.get_client(sid)
+        assert entry.last_used == recent
+
+        entry.last_used = time.monotonic() - 120
+        store.get_client(sid)
+        assert entry.last_used > recent
+
+
+# ---------------------------------------------------------------------------
+# MAX_SESSIONS eviction
+# ---------------------------------------------------------------------------
+
+
+class TestMaxSessions:
+    """Tests for evicting sessions once the store is full."""
+
+    @patch("backend.session_store.MAX_SESSIONS", 2)
+    def test_evicts_least_recently_used(self) -> None:
+        """Evict and close the least recently used session when a new one exceeds the cap."""
+        store = SessionStore()
+        loaders = {sid: MagicMock() for sid in ("a", "b", "c")}
+        entries = {sid: _SessionEntry(loader=loaders[sid], username=sid) for sid in loaders}
+        store._add_entry("a", entries["a"])
+        store._add_entry("b", entries["b"])
+        entries["a"].last_used = time.monotonic() - 120
+        store.get_client("a")  # "a" becomes the most recently used session
+
+        store._add_entry("c", entries["c"])
+
+        assert list(store._sessions) == ["a", "c"]
+        loaders["b"].close.assert_called_once()
+
+    @patch("backend.session_store.MAX_SESSIONS", 1)
+    def test_expiry_heap_stays_bounded(self) -> None:
+        """Drop heap entries of evicted sessions once the heap outgrows the cap."""
+        store = SessionStore()
+        for i in range(5):
+            store._add_entry(f"s{i}", _SessionEntry(loader=MagicMock(), username="u"))
+
+        assert len(store._expiry_heap) <= 2
+        assert list(store._sessions) == ["s4"]
 
 
 # ---------------------------------------------------------------------------
@@ -169,9 +342,22 @@ class TestRemove:
 
     def test_remove_existing(self) -> None:
         """Remove an existing session successfully."""
-        store, sid = _create_store_with_session()
+        loader = MagicMock()
+        store, sid = _create_store_with_session(loader=loader)
+        store.remove(sid)
+        assert sid not in store._sessions
+        loader.close.assert_called_once()
+
+    def test_close_failure_is_ignored(self, caplog: pytest.LogCaptureFixture) -> None:
+        """Log, but do not raise, when closing the removed session's loader fails."""
+        loader = MagicMock()
+        loader.close.side_effect = OSError("already closed")
+        store, sid = _create_store_with_session(loader=loader)
+
         store.remove(sid)
+
         assert sid not in store._sessions
+        assert "Failed to close Instaloader" in caplog.text
 
     def test_remove_unknown_is_noop(self) -> None:
         """Silently ignore removal of a non-existent session."""
@@ -193,25 +379,77 @@ class TestCleanupExpired:
 
         # Fresh session
         fresh_loader = MagicMock()
-        store._sessions["fresh"] = _SessionEntry(loader=fresh_loader, username="fresh_user")
+        store._add_entry("fresh", _SessionEntry(loader=fresh_loader, username="fresh_user"))
 
         # Expired session
-        old_time = datetime.now(UTC) - SESSION_TTL - timedelta(seconds=10)
+        old_time = time.monotonic() - SESSION_TTL_SECONDS - 10
         expired_loader = MagicMock()
-        store._sessions["old"] = _SessionEntry(
-            loader=expired_loader,
-            username="old_user",
-            created_at=old_time,
-            last_used=old_time,
+        store._add_entry(
+            "old",
+            _SessionEntry(
+                loader=expired_loader,
+                username="old_user",
+                created_at=old_time,
+                last_used=old_time,
+            ),
         )
 
         store.cleanup_expired()
 
         assert "fresh" in store._sessions
         assert "old" not in store._sessions
+        expired_loader.close.assert_called_once()
+        fresh_loader.close.assert_not_called()
+
+    def test_rebuilds_sessions_when_most_expired(self) -> None:
+        """Replace the session dict when more than half of the sessions expired."""
+        store, fresh_sid = _create_store_with_session()
+        old_time = time.monotonic() - SESSION_TTL_SECONDS - 10
+        for i in range(3):
+            store._add_entry(
+                f"old-{i}", _SessionEntry(loader=MagicMock(), username="old", created_at=old_time, last_used=old_time)
+            )
+        sessions_before = store._sessions
+
+        store.cleanup_expired()
+
+        assert store._sessions is not sessions_before
+        assert list(store._sessions) == [fresh_sid]
+
+    def test_logs_expired_ids_only_at_debug(self, caplog: pytest.LogCaptureFixture) -> None:
+        """Log the number of expired sessions at INFO and their IDs at DEBUG."""
+        store, sid = _create_store_with_session(created_at=time.monotonic() - SESSION_TTL_SECONDS - 1)
+
+        with caplog.at_level(logging.DEBUG, logger="backend.session_store"):
+            store.cleanup_expired()
+
+        info_messages = [r.getMessage() for r in caplog.records if r.levelno == logging.INFO]
+        debug_messages = [r.getMessage() for r in caplog.records if r.levelno == logging.DEBUG]
+        assert info_messages == ["Cleaned up 1 expired session(s)"]
+        assert debug_messages == [f"Expired session {sid} removed"]
 
     def test_no_expired_sessions(self) -> None:
         """Do nothing when all sessions are fresh."""
         store, sid = _create_store_with_session()
         store.cleanup_expired()
         assert sid in store._sessions
+
+    def test_keeps_sessions_used_since_scheduled(self) -> None:
+        """Reschedule, rather than remove, a session used after its expiry was scheduled."""
+        store, sid = _create_store_with_session(created_at=time.monotonic() - SESSION_TTL_SECONDS - 1)
+        store._sessions[sid].last_used = time.monotonic()
+
+        store.cleanup_expired()
+
+        assert sid in store._sessions
+        assert store._expiry_heap == [(store._sessions[sid].expires_at, sid)]
+
+    def test_skips_sessions_already_removed(self) -> None:
+        """Ignore due expiry entries of sessions that were logged out earlier."""
+        expired_time = time.monotonic() - SESSION_TTL_SECONDS - 1
+        store, sid = _create_store_with_session(created_at=expired_time)
+        store.remove(sid)
+
+        store.cleanup_expired()
+
+        assert not store._expiry_heap
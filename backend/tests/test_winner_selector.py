@@ -1,6 +1,7 @@
 """Tests for backend.winner_selector module."""
 
 import random
+from unittest.mock import patch
 
 import pytest
 
@@ -81,6 +82,21 @@ class TestPickWinners:
         with pytest.raises(InsufficientEligibleUsersError, match="Only 1 user"):
             pick_winners(users, num_winners=3, min_comments=1)
 
+    def test_threshold_of_one_skips_filter(self, sample_users: list[CommentUserData]) -> None:
+        """Sample the whole pool without filtering when the threshold is one."""
+        with patch("backend.winner_selector.filter_eligible_users") as mock_filter:
+            winners = pick_winners(sample_users, num_winners=len(sample_users), min_comments=1)
+
+        mock_filter.assert_not_called()
+        assert set(winners) == {u.username for u in sample_users}
+
+    def test_higher_threshold_filters(self, sample_users: list[CommentUserData]) -> None:
+        """Filter the pool when the threshold is above one."""
+        with patch("backend.winner_selector.filter_eligible_users", wraps=filter_eligible_users) as mock_filter:
+            pick_winners(sample_users, num_winners=1, min_comments=2)
+
+        mock_filter.assert_called_once_with(sample_users, 2)
+
     def test_insufficient_due_to_threshold(self, sample_users: list[CommentUserData]) -> None:
         """Raise when threshold filters out too many users."""
         with pytest.raises(InsufficientEligibleUsersError):
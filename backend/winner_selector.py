@@ -57,7 +57,9 @@ def pick_winners(
         InsufficientEligibleUsersError: If the eligible pool is smaller
             than ``num_winners``.
     """
-    eligible = filter_eligible_users(users, min_comments)
+    # Every commenter has at least one comment, so a threshold of one keeps
+    # the whole pool: sample from it directly instead of copying it first.
+    eligible = users if min_comments <= 1 else filter_eligible_users(users, min_comments)
 
     if len(eligible) < num_winners:
         raise InsufficientEligibleUsersError(
@@ -66,5 +68,10 @@ def pick_winners(
             f"Try lowering the minimum-comment threshold."
         )
 
+    if num_winners == 1:
+        # The most common draw: a single index avoids random.sample's
+        # pool copy and selection bookkeeping.
+        return [random.choice(eligible).username]
+
     selected = random.sample(eligible, num_winners)
     return [user.username for user in selected]
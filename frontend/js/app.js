@@ -261,7 +261,7 @@ function clearSavedCookie() {
  * Persist the backend session ID so that page reloads can reuse the
  * existing Instaloader session without contacting Instagram again.
  *
- * @param {string} sessionId — The UUID4 session identifier from /api/login.
+ * @param {string} sessionId — The session identifier from /api/login.
  */
 function saveSessionId(sessionId) {
   localStorage.setItem(SESSION_ID_STORAGE_KEY, sessionId);